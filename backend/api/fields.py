@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+
+def check_image_header(file):
+    """Проверяет размер файла и изображения по заголовку,
+    не декодируя пиксели."""
+    if file.size > settings.RECIPE_IMAGE_MAX_BYTES:
+        raise serializers.ValidationError(
+            'Файл изображения слишком большой'
+        )
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except Exception:
+        raise serializers.ValidationError('Загрузите корректное изображение')
+    finally:
+        file.seek(0)
+    if max(width, height) > settings.RECIPE_IMAGE_MAX_SIDE:
+        raise serializers.ValidationError(
+            'Слишком большое разрешение изображения'
+        )
+
+
+class RecipeImageField(Base64ImageField):
+    """Принимает изображение строкой base64 или файлом multipart."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            check_image_header(data)
+            return serializers.ImageField.to_internal_value(self, data)
+        if (
+            isinstance(data, str)
+            and len(data) * 3 // 4 > settings.RECIPE_IMAGE_MAX_BYTES
+        ):
+            raise serializers.ValidationError(
+                'Файл изображения слишком большой'
+            )
+        file = super().to_internal_value(data)
+        if file is not None:
+            check_image_header(file)
+        return file
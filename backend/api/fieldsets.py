@@ -0,0 +1,125 @@
+from collections import defaultdict
+
+from django.db.models import Count, Exists, F, OuterRef, Prefetch, Window
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+from api.viewer import is_batched
+from users.models import Follow
+from recipes.models import Favorite, IngredientRecipe, Recipe, ShoppingCart
+
+
+def split_names(value):
+    if value is None:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def is_wanted(request, name):
+    """Проверяет, запрошено ли поле параметрами fields= и omit=.
+
+    Параметры действуют только на чтение: ответ на запись отдаётся
+    целиком.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return True
+    fields = split_names(request.query_params.get('fields'))
+    omit = split_names(request.query_params.get('omit')) or set()
+    if name == 'id':
+        return True
+    return (fields is None or name in fields) and name not in omit
+
+
+class SparseFieldsMixin:
+    """Отбрасывает поля верхнего уровня, не запрошенные клиентом."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        top_level = self.parent is None or (
+            isinstance(self.parent, ListSerializer)
+            and self.parent.parent is None
+        )
+        if not top_level:
+            return fields
+        request = self.context.get('request')
+        return {
+            name: field for name, field in fields.items()
+            if is_wanted(request, name)
+        }
+
+
+def plan_recipes(queryset, request, shared=False):
+    """Подгружает для рецептов только то, что попадёт в ответ."""
+    user = request.user
+    if not is_wanted(request, 'text'):
+        queryset = queryset.defer('text')
+    if is_wanted(request, 'author'):
+        queryset = queryset.select_related('author')
+    if is_wanted(request, 'ingredients'):
+        queryset = queryset.prefetch_related(Prefetch(
+            'ingredienttorecipe',
+            queryset=IngredientRecipe.objects.select_related('ingredient')
+        ))
+    if shared or user.is_anonymous or is_batched(request):
+        return queryset
+    if is_wanted(request, 'is_favorited'):
+        queryset = queryset.annotate(is_favorited=Exists(
+            Favorite.objects.filter(user=user, recipe=OuterRef('pk'))
+        ))
+    if not is_wanted(request, 'is_in_shopping_cart'):
+        return queryset
+    return queryset.annotate(is_in_shopping_cart=Exists(
+        ShoppingCart.objects.filter(user=user, recipe=OuterRef('pk'))
+    ))
+
+
+def plan_users(queryset, request):
+    user = request.user
+    if (
+        user.is_anonymous
+        or is_batched(request)
+        or not is_wanted(request, 'is_subscribed')
+    ):
+        return queryset
+    return queryset.annotate(is_subscribed=Exists(
+        Follow.objects.filter(user=user, author=OuterRef('pk'))
+    ))
+
+
+def plan_subscriptions(queryset, request):
+    queryset = queryset.select_related('author').order_by('-id')
+    if not is_wanted(request, 'recipes_count'):
+        return queryset
+    return queryset.annotate(recipes_count=Count('author__recipes'))
+
+
+def load_subscription_recipes(follows, request):
+    """Одним запросом проставляет подпискам страницы author_recipes —
+    последние recipes_limit рецептов автора."""
+    if not follows or not is_wanted(request, 'recipes'):
+        return
+    limit = request.query_params.get('recipes_limit')
+    author_ids = {follow.author_id for follow in follows}
+    queryset = Recipe.objects.filter(author_id__in=author_ids).only(
+        'id', 'name', 'image', 'cooking_time', 'author_id'
+    ).order_by('author_id', '-pub_date', '-id')
+    if limit:
+        ranked = Recipe.objects.filter(author_id__in=author_ids).annotate(
+            author_rank=Window(
+                RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc())
+            )
+        ).order_by().values('id', 'author_rank')
+        sql, params = ranked.query.sql_with_params()
+        queryset = queryset.filter(id__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE author_rank <= %s',
+            (*params, int(limit))
+        ))
+    recipes = defaultdict(list)
+    for recipe in queryset:
+        recipes[recipe.author_id].append(recipe)
+    for follow in follows:
+        follow.author_recipes = recipes[follow.author_id]
@@ -1,27 +1,58 @@
+from django import forms
 from django_filters.rest_framework import FilterSet, filters
 from rest_framework.filters import SearchFilter
 
-from recipes.models import Recipe, Tag, Ingredient
+from recipes.models import Recipe, Ingredient
+from recipes.tag_registry import tag_registry
+
+RECIPE_ORDERINGS = {
+    '-pub_date': ('-pub_date',),
+    'cooking_time': ('cooking_time', '-pub_date'),
+    'name': ('name', 'id'),
+    'popular': ('-popularity', '-id'),
+}
+
+
+class TagSlugField(forms.MultipleChoiceField):
+    """Проверяет slug по реестру тегов, без запроса к БД."""
+
+    def valid_value(self, value):
+        return tag_registry.has_slug(value)
+
+
+class TagSlugFilter(filters.MultipleChoiceFilter):
+    field_class = TagSlugField
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        to_field_name='slug',
-        field_name='tags__slug',
-        queryset=Tag.objects.all(),
-    )
+    tags = TagSlugFilter(method='filter_tags')
     is_in_shopping_cart = filters.NumberFilter(
         method='filter_is_in_shopping_cart'
     )
     is_favorited = filters.NumberFilter(
         method='filter_is_favorited'
     )
+    cooking_time_min = filters.NumberFilter(
+        field_name='cooking_time',
+        lookup_expr='gte'
+    )
+    cooking_time_max = filters.NumberFilter(
+        field_name='cooking_time',
+        lookup_expr='lte'
+    )
+    ordering = filters.ChoiceFilter(
+        choices=[(key, key) for key in RECIPE_ORDERINGS],
+        method='filter_ordering'
+    )
 
     class Meta:
         model = Recipe
         fields = (
             'is_in_shopping_cart',
+            'cooking_time_min',
+            'cooking_time_max',
             'is_favorited',
+            'ordering',
             'author',
             'tags'
         )
@@ -38,6 +69,14 @@ class RecipeFilter(FilterSet):
             return queryset.filter(favorites__user=user)
         return queryset
 
+    def filter_tags(self, queryset, name, value):
+        return queryset.filter(
+            tags__in=tag_registry.ids_for_slugs(value)
+        ).distinct()
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*RECIPE_ORDERINGS[value])
+
 
 class IngredientFilter(SearchFilter):
     search_param = 'name'
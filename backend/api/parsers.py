@@ -0,0 +1,39 @@
+import json
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import DataAndFiles, MultiPartParser
+
+
+class MultiPartJSONParser(MultiPartParser):
+    """multipart/form-data, в котором вложенные поля переданы JSON-строкой.
+
+    Файлы сохраняются обработчиками загрузки Django во временные файлы
+    по частям, поэтому изображение не читается в память целиком.
+    """
+    json_fields = ('ingredients', 'tags')
+
+    @staticmethod
+    def load_list(key, values):
+        """Поле может прийти JSON-массивом или повторяться (tags=1&tags=2);
+        результат всегда список, даже если значение одно."""
+        items = []
+        for value in values:
+            try:
+                item = json.loads(value)
+            except ValueError as error:
+                raise ParseError(f'{key}: {error}')
+            if isinstance(item, list):
+                items.extend(item)
+            else:
+                items.append(item)
+        return items
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parsed = super().parse(stream, media_type, parser_context)
+        data = {}
+        for key, values in parsed.data.lists():
+            if key in self.json_fields:
+                data[key] = self.load_list(key, values)
+            else:
+                data[key] = values[-1]
+        return DataAndFiles(data, parsed.files.dict())
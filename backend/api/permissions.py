@@ -1,5 +1,7 @@
 from rest_framework.permissions import SAFE_METHODS, BasePermission
 
+from api.viewer import is_shared_request
+
 
 class IsAuthorOrReadOnly(BasePermission):
 
@@ -16,3 +18,15 @@ class IsAdminOrReadOnly(BasePermission):
     def has_permission(self, request, view):
         return (request.method in SAFE_METHODS
                 or request.user.is_staff)
+
+
+class IsAuthenticatedOrShared(BasePermission):
+    """Общий ответ (shared=1) списка и рецепта одинаков для всех
+    и доступен без авторизации, остальное — только пользователям."""
+
+    def has_permission(self, request, view):
+        return request.user.is_authenticated or (
+            request.method in SAFE_METHODS
+            and view.action in ('list', 'retrieve')
+            and is_shared_request(request)
+        )
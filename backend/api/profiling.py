@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger('api.queries')
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+IN_LIST = re.compile(r'\bIN \((?:\s*(?:\?|%s)\s*,?)+\)', re.IGNORECASE)
+SPACES = re.compile(r'\s+')
+MULTI_ROW = re.compile(r'(\bVALUES \([^()]*\))(?:, \([^()]*\))+')
+UNION_ROWS = re.compile(
+    r'(SELECT (?:\?|%s)(?:, (?:\?|%s))*)(?: UNION ALL \1)+'
+)
+PROJECT_ROOT = str(settings.BASE_DIR)
+
+_lock = threading.Lock()
+_local = threading.local()
+_stats = defaultdict(lambda: [0, 0.0, 0.0])
+_last_flush = [time.monotonic()]
+
+
+def fingerprint(sql):
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = SPACES.sub(' ', sql).strip()
+    sql = MULTI_ROW.sub(r'\1, ...', sql)
+    return UNION_ROWS.sub(r'\1 UNION ALL ...', sql)
+
+
+def project_frames():
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            filename.startswith(PROJECT_ROOT)
+            and 'site-packages' not in filename
+            and filename != __file__
+        ):
+            yield frame
+        frame = frame.f_back
+
+
+def call_site(frame):
+    owner = frame.f_locals.get('self')
+    name = frame.f_code.co_name
+    if owner is not None:
+        return f'{type(owner).__name__}.{name}'
+    module = os.path.relpath(frame.f_code.co_filename, PROJECT_ROOT)
+    return f'{module}:{name}'
+
+
+def record(execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        frames = list(project_frames())
+        site = call_site(frames[0]) if frames else '-'
+        view = getattr(_local, 'view', '-')
+        key = (fingerprint(sql), view, site)
+        with _lock:
+            stats = _stats[key]
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+        if elapsed >= settings.QUERY_PROFILING_SLOW_MS:
+            trimmed = ' <- '.join(
+                f'{call_site(frame)}:{frame.f_lineno}'
+                for frame in frames[:5]
+            )
+            logger.warning(
+                'Медленный запрос %.1f мс в %s: %s [%s]',
+                elapsed, view, sql[:500], trimmed
+            )
+
+
+def flush():
+    """Сбрасывает накопленную статистику процесса в файл для
+    query_report."""
+    with _lock:
+        rows = [
+            [sql, view, site, count, total, peak]
+            for (sql, view, site), (count, total, peak) in _stats.items()
+        ]
+        _last_flush[0] = time.monotonic()
+    os.makedirs(settings.QUERY_PROFILING_DIR, exist_ok=True)
+    path = os.path.join(
+        settings.QUERY_PROFILING_DIR, f'queries.{os.getpid()}.json'
+    )
+    with open(f'{path}.tmp', 'w') as output:
+        json.dump(rows, output)
+    os.replace(f'{path}.tmp', path)
+
+
+class QueryProfilingMiddleware:
+    """Включается настройкой QUERY_PROFILING."""
+
+    def __init__(self, get_response):
+        if not settings.QUERY_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.view = '-'
+        try:
+            with connection.execute_wrapper(record):
+                return self.get_response(request)
+        finally:
+            if (
+                time.monotonic() - _last_flush[0]
+                > settings.QUERY_PROFILING_FLUSH_SECONDS
+            ):
+                flush()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _local.view = match.view_name if match else view_func.__name__
@@ -1,20 +1,29 @@
-# from django.db import transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Manager
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
-from users.models import Follow, User
+from recipes import outbox
+from recipes.ingredient_index import ingredient_index
+from recipes.tag_registry import load_tag_ids, tag_registry
+from api.fields import RecipeImageField
+from api.fieldsets import SparseFieldsMixin
+from api.viewer import viewer_state
+from users.models import Follow, FollowSuggestion, User
 from recipes.models import (
     IngredientRecipe,
+    SimilarRecipe,
     ShoppingCart,
     Ingredient,
+    Change,
     Favorite,
     Recipe,
     Tag
 )
 
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SparseFieldsMixin, UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
@@ -29,11 +38,35 @@ class CustomUserSerializer(UserSerializer):
         model = User
         lookup_field = 'username'
 
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('shared'):
+            fields.pop('is_subscribed', None)
+        return fields
+
     def get_is_subscribed(self, obj):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
-        return Follow.objects.filter(user=user, author=obj.id).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        request = self.context.get('request')
+        return obj.id in viewer_state(request).followed_author_ids
+
+
+class FollowSuggestionSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = FollowSuggestion
+        fields = ('score',)
+
+    def to_representation(self, instance):
+        data = CustomUserSerializer(
+            instance.author,
+            context=self.context
+        ).data
+        data.update(super().to_representation(instance))
+        return data
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -76,6 +109,34 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
         )
 
 
+class SimilarRecipeSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = SimilarRecipe
+        fields = ('score',)
+
+    def to_representation(self, instance):
+        data = ShortRecipeSerializer(
+            instance.similar,
+            context=self.context
+        ).data
+        data.update(super().to_representation(instance))
+        return data
+
+
+class ChangeSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Change
+        fields = (
+            'object_id',
+            'created_at',
+            'entity',
+            'action',
+            'id'
+        )
+
+
 class TagSerializer(serializers.ModelSerializer):
 
     class Meta:
@@ -101,9 +162,7 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
     name = serializers.ReadOnlyField(source='ingredient.name')
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all()
-    )
+    id = serializers.IntegerField(source='ingredient_id')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit'
     )
@@ -122,12 +181,10 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     ingredients = IngredientRecipeSerializer(
         many=True,
     )
-    tags = serializers.PrimaryKeyRelatedField(
-        many=True,
-        queryset=Tag.objects.all(),
-        error_messages={'does_not_exist': 'Такого тега не существует'}
+    tags = serializers.ListField(
+        child=serializers.IntegerField()
     )
-    image = Base64ImageField(max_length=None)
+    image = RecipeImageField(max_length=None)
     author = CustomUserSerializer(read_only=True)
     cooking_time = serializers.IntegerField()
 
@@ -144,36 +201,111 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             'id'
         )
 
+    @staticmethod
+    def check_ids(ids):
+        if not ids:
+            raise serializers.ValidationError('Список не может быть пустым')
+        if len(set(ids)) != len(ids):
+            raise serializers.ValidationError('Элементы не должны повторяться')
+
+    @staticmethod
+    def report_missing(missing, error):
+        """Сообщает обо всех отсутствующих id сразу."""
+        if missing:
+            raise serializers.ValidationError(
+                f'{error}: {", ".join(map(str, missing))}'
+            )
+
+    @classmethod
+    def resolve(cls, model, ids, error):
+        """Достаёт объекты одним IN-запросом."""
+        cls.check_ids(ids)
+        objects = model.objects.in_bulk(ids)
+        cls.report_missing([pk for pk in ids if pk not in objects], error)
+        return objects
+
+    def validate_tags(self, value):
+        self.check_ids(value)
+        self.report_missing(
+            tag_registry.missing_ids(value),
+            'Такого тега не существует'
+        )
+        return value
+
+    def validate_ingredients(self, value):
+        ingredients = self.resolve(
+            Ingredient,
+            [item['ingredient_id'] for item in value],
+            'Такого ингредиента не существует'
+        )
+        return [
+            {
+                'ingredient': ingredients[item['ingredient_id']],
+                'amount': item['amount']
+            }
+            for item in value
+        ]
+
+    @staticmethod
+    def set_tags(recipe, tags):
+        """Привязывает теги; тег, удалённый после проверки по реестру,
+        даёт ошибку валидации, а не 500.
+
+        Внешние ключи проверяются отложенно, поэтому проверка
+        принудительно выполняется внутри точки сохранения.
+        """
+        try:
+            with transaction.atomic():
+                recipe.tags.set(tags)
+                connection.check_constraints(
+                    table_names=[Recipe.tags.through._meta.db_table]
+                )
+        except IntegrityError:
+            tag_registry.expire()
+            raise serializers.ValidationError(
+                {'tags': ['Такого тега не существует']}
+            )
+
     def create_ingredients(self, recipe, ingredients):
         ingredient_list = [
             IngredientRecipe(
-                ingredient=ingredient_data.pop("id"),
-                amount=ingredient_data.pop("amount"),
+                ingredient=ingredient_data["ingredient"],
+                amount=ingredient_data["amount"],
                 recipe=recipe,
             )
             for ingredient_data in ingredients
         ]
         IngredientRecipe.objects.bulk_create(ingredient_list)
+        outbox.record_once(
+            Change.RECIPE_INGREDIENTS,
+            Change.UPDATE,
+            recipe.id,
+            public=True
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("ingredients")
         tags_data = validated_data.pop("tags")
         recipe = Recipe.objects.create(
             author=self.context["request"].user, **validated_data
         )
-        recipe.tags.set(tags_data)
+        self.set_tags(recipe, tags_data)
         self.create_ingredients(recipe, ingredients)
+        ingredient_index.schedule_update(recipe.id)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        ingredients = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        self.create_ingredients(instance, ingredients)
-        instance.save()
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        instance = super().update(instance, validated_data)
+        if tags is not None:
+            self.set_tags(instance, tags)
+        if ingredients is not None:
+            instance.ingredients.clear()
+            self.create_ingredients(instance, ingredients)
+        ingredient_index.schedule_update(instance.id)
         return instance
 
     def to_representation(self, instance):
@@ -248,11 +380,21 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
     #     }).data
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        if 'tags' in self.child.fields:
+            recipes = list(recipes)
+            load_tag_ids(recipes)
+        return super().to_representation(recipes)
+
+
+class RecipeReadSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     author = CustomUserSerializer(read_only=True, many=False)
-    tags = TagSerializer(read_only=False, many=True)
+    tags = serializers.SerializerMethodField()
     image = Base64ImageField(max_length=None)
     ingredients = IngredientRecipeSerializer(
         many=True,
@@ -273,6 +415,19 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'tags',
             'id'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.context.get('shared'):
+            fields.pop('is_favorited', None)
+            fields.pop('is_in_shopping_cart', None)
+        return fields
+
+    def get_tags(self, obj):
+        if getattr(obj, 'tag_ids', None) is None:
+            load_tag_ids([obj])
+        return tag_registry.render(obj.tag_ids)
 
     def get_ingredients(self, obj):
         ingredients = IngredientRecipe.objects.filter(recipe=obj)
@@ -282,16 +437,20 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return obj.favorites.filter(user=request.user).exists()
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return obj.id in viewer_state(request).favorite_recipe_ids
 
     def get_is_in_shopping_cart(self, obj):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return obj.shopping_list.filter(user=request.user).exists()
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return obj.id in viewer_state(request).cart_recipe_ids
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes_count = serializers.SerializerMethodField()
     first_name = serializers.ReadOnlyField(source='author.first_name')
@@ -315,11 +474,16 @@ class FollowSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        request = self.context.get('request')
+        if request and request.user.id == obj.user_id:
+            return obj.author_id in viewer_state(request).followed_author_ids
         return Follow.objects.filter(
             user=obj.user, author=obj.author
         ).exists()
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'author_recipes'):
+            return ShortRecipeSerializer(obj.author_recipes, many=True).data
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         queryset = Recipe.objects.filter(author=obj.author)
@@ -328,6 +492,8 @@ class FollowSerializer(serializers.ModelSerializer):
         return ShortRecipeSerializer(queryset, many=True).data
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj.author).count()
 
 
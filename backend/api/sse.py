@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import secrets
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Change
+from users.models import EventTicket
+from recipes import outbox, pubsub
+from recipes.outbox import LIVE_ENTITIES
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('position', 'entity', 'action', 'object_id', 'user_id')
+
+
+def issue_ticket(user):
+    """Выдаёт билет на подключение к потоку и удаляет просроченные."""
+    now = timezone.now()
+    EventTicket.objects.filter(expires_at__lte=now).delete()
+    return EventTicket.objects.create(
+        key=secrets.token_urlsafe(32),
+        user=user,
+        expires_at=now + timedelta(seconds=settings.EVENTS_TICKET_TTL)
+    )
+
+
+@sync_to_async
+def authenticate(key):
+    token = Token.objects.select_related('user').filter(key=key).first()
+    if token is None or not token.user.is_active:
+        return None
+    return token.user
+
+
+@sync_to_async
+def redeem_ticket(key):
+    """Гасит билет и возвращает его владельца; билет одноразовый."""
+    with transaction.atomic():
+        ticket = EventTicket.objects.select_for_update(
+            of=('self',)
+        ).select_related('user').filter(key=key).first()
+        if ticket is None:
+            return None
+        ticket.delete()
+    if ticket.expires_at <= timezone.now() or not ticket.user.is_active:
+        return None
+    return ticket.user
+
+
+@sync_to_async
+def fetch_changes(since, user_ids, limit):
+    try:
+        return list(Change.objects.filter(
+            position__gt=since,
+            user_id__in=user_ids,
+            entity__in=LIVE_ENTITIES
+        ).order_by('position').values(*FIELDS)[:limit])
+    except Exception:
+        connection.close()
+        raise
+
+
+@sync_to_async
+def last_position():
+    try:
+        return outbox.last_position()
+    except Exception:
+        connection.close()
+        raise
+
+
+class Broker:
+    """Раздаёт изменения подключённым пользователям процесса.
+
+    Один цикл опрашивает журнал изменений сразу для всех подписчиков.
+    Будит его нумерация журнала (outbox.sequence в sequence_changes):
+    NOTIFY на Postgres (pubsub.listen) или pubsub в этом же процессе;
+    раз в EVENTS_POLL_INTERVAL секунд журнал читается и без уведомления,
+    на случай обрыва LISTEN-соединения. Записи читаются по номеру в
+    журнале, так что курсор не обгоняет незакоммиченные транзакции.
+    """
+
+    def __init__(self):
+        self.subscribers = defaultdict(set)
+        self.task = None
+        self.wake = None
+        self.cursor = None
+        self.listener = None
+        self.listener_fd = None
+
+    @property
+    def connections(self):
+        return sum(len(queues) for queues in self.subscribers.values())
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue()
+        self.subscribers[user_id].add(queue)
+        if self.task is None or self.task.done():
+            self.wake = asyncio.Event()
+            pubsub.attach(asyncio.get_running_loop(), self.wake.set)
+            self.task = asyncio.ensure_future(self.run())
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self.subscribers[user_id]
+
+    async def listen(self):
+        if self.listener is not None or connection.vendor != 'postgresql':
+            return
+        try:
+            self.listener = await sync_to_async(pubsub.listen)()
+        except Exception:
+            logger.exception('Не удалось подписаться на уведомления')
+            return
+        self.listener_fd = self.listener.fileno()
+        asyncio.get_running_loop().add_reader(
+            self.listener_fd, self.on_notify
+        )
+
+    def on_notify(self):
+        try:
+            self.listener.poll()
+            self.listener.notifies.clear()
+        except Exception:
+            logger.exception('Соединение с уведомлениями потеряно')
+            asyncio.get_running_loop().remove_reader(self.listener_fd)
+            self.listener.close()
+            self.listener = None
+        self.wake.set()
+
+    async def run(self):
+        while True:
+            try:
+                await self.listen()
+                if self.cursor is None:
+                    self.cursor = await last_position()
+                await self.poll()
+            except Exception:
+                logger.exception('Не удалось прочитать журнал изменений')
+            try:
+                await asyncio.wait_for(
+                    self.wake.wait(), settings.EVENTS_POLL_INTERVAL
+                )
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+
+    async def poll(self):
+        while self.subscribers:
+            rows = await fetch_changes(
+                self.cursor, list(self.subscribers),
+                settings.EVENTS_BATCH_SIZE
+            )
+            for row in rows:
+                for queue in self.subscribers.get(row['user_id'], ()):
+                    queue.put_nowait(row)
+            if rows:
+                self.cursor = rows[-1]['position']
+            if len(rows) < settings.EVENTS_BATCH_SIZE:
+                return
+
+
+broker = Broker()
+
+
+def encode(row):
+    data = json.dumps({key: row[key] for key in FIELDS})
+    return (
+        f'id: {row["position"]}\nevent: {row["entity"]}\ndata: {data}\n\n'
+    ).encode()
+
+
+async def respond(send, status, message):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({
+        'type': 'http.response.body',
+        'body': json.dumps({'errors': message}, ensure_ascii=False).encode(),
+    })
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def events_app(scope, receive, send):
+    """SSE-поток изменений корзины, избранного и подписок пользователя.
+
+    Токен передаётся заголовком Authorization. EventSource не умеет
+    задавать заголовки, поэтому браузер подключается с параметром
+    ticket: одноразовым билетом из POST /api/events/ticket/.
+    """
+    headers = dict(scope['headers'])
+    query = parse_qs(scope['query_string'].decode())
+    key = headers.get(b'authorization', b'').decode().partition(
+        'Token '
+    )[2]
+    ticket = query.get('ticket', [''])[0]
+    if key:
+        user = await authenticate(key)
+    elif ticket:
+        user = await redeem_ticket(ticket)
+    else:
+        user = None
+    if user is None:
+        await respond(send, 401, 'Учетные данные не были предоставлены')
+        return
+    if broker.connections >= settings.EVENTS_MAX_CONNECTIONS:
+        await respond(send, 503, 'Слишком много подключений')
+        return
+    if len(broker.subscribers.get(user.id, ())) >= (
+        settings.EVENTS_MAX_PER_USER
+    ):
+        await respond(send, 429, 'Слишком много подключений')
+        return
+    try:
+        last_id = int(
+            headers.get(b'last-event-id', b'').decode()
+            or query.get('since', ['0'])[0]
+        )
+    except ValueError:
+        last_id = 0
+
+    queue = broker.subscribe(user.id)
+    disconnect = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': f'retry: {settings.EVENTS_RETRY_MS}\n\n'.encode(),
+            'more_body': True,
+        })
+        while last_id and not disconnect.done():
+            rows = await fetch_changes(
+                last_id, [user.id], settings.EVENTS_BATCH_SIZE
+            )
+            for row in rows:
+                await send({
+                    'type': 'http.response.body',
+                    'body': encode(row),
+                    'more_body': True,
+                })
+            if rows:
+                last_id = rows[-1]['position']
+            if len(rows) < settings.EVENTS_BATCH_SIZE:
+                break
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.EVENTS_MAX_AGE
+        while not disconnect.done() and loop.time() < deadline:
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                (getter, disconnect),
+                timeout=settings.EVENTS_HEARTBEAT,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            if getter in done:
+                row = getter.result()
+                if row['position'] <= last_id:
+                    continue
+                body = encode(row)
+            else:
+                getter.cancel()
+                body = b': ping\n\n'
+            if not disconnect.done():
+                await send({
+                    'type': 'http.response.body',
+                    'body': body,
+                    'more_body': True,
+                })
+        if not disconnect.done():
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        broker.unsubscribe(user.id, queue)
+        disconnect.cancel()
@@ -0,0 +1,74 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Recipe
+from users.models import Follow, User
+
+
+def create_user(name):
+    return User.objects.create_user(
+        username=name,
+        email=f'{name}@example.com',
+        password='password',
+        first_name=name,
+        last_name=name
+    )
+
+
+class SubscriptionFieldsTests(APITestCase):
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.client.force_authenticate(self.user)
+
+    def add_author(self, number, recipes=3):
+        author = create_user(f'author{number}')
+        for index in range(recipes):
+            Recipe.objects.create(
+                author=author,
+                name=f'recipe {index}',
+                text='text',
+                cooking_time=10,
+                image='recipes/image/recipe.png'
+            )
+        Follow.objects.create(user=self.user, author=author)
+        return author
+
+    def subscriptions(self, query=''):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/users/subscriptions/{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'], len(queries)
+
+    def test_recipes_are_loaded_for_the_whole_page_at_once(self):
+        self.add_author(0)
+        _, single = self.subscriptions('?recipes_limit=2')
+        for number in range(1, 4):
+            self.add_author(number)
+        results, many = self.subscriptions('?recipes_limit=2')
+        self.assertEqual(single, many)
+        self.assertEqual(len(results), 4)
+        for result in results:
+            self.assertEqual(
+                [recipe['name'] for recipe in result['recipes']],
+                ['recipe 2', 'recipe 1']
+            )
+            self.assertEqual(result['recipes_count'], 3)
+
+    def test_without_limit_all_recipes_are_returned(self):
+        self.add_author(0)
+        results, _ = self.subscriptions()
+        self.assertEqual(len(results[0]['recipes']), 3)
+
+    def test_fields_param_does_not_cut_write_response(self):
+        author = create_user('author')
+        response = self.client.post(
+            f'/api/users/{author.id}/subscribe/?fields=email'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('recipes', response.data)
+        self.assertIn('username', response.data)
+        results, _ = self.subscriptions('?fields=email')
+        self.assertEqual(set(results[0]), {'email', 'id'})
@@ -0,0 +1,35 @@
+from io import BytesIO
+
+from django.test import SimpleTestCase
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from rest_framework.test import APIRequestFactory
+
+from api.parsers import MultiPartJSONParser
+
+
+class MultiPartJSONParserTests(SimpleTestCase):
+
+    def parse(self, data):
+        body = encode_multipart(BOUNDARY, data)
+        request = APIRequestFactory().post(
+            '/', body, content_type=MULTIPART_CONTENT
+        )
+        return MultiPartJSONParser().parse(
+            BytesIO(body),
+            MULTIPART_CONTENT,
+            {'request': request, 'encoding': 'utf-8'}
+        ).data
+
+    def test_single_values_are_lists(self):
+        data = self.parse({
+            'tags': '1',
+            'ingredients': '{"id": 1, "amount": 2}',
+            'name': 'recipe',
+        })
+        self.assertEqual(data['tags'], [1])
+        self.assertEqual(data['ingredients'], [{'id': 1, 'amount': 2}])
+        self.assertEqual(data['name'], 'recipe')
+
+    def test_repeated_values_and_arrays(self):
+        self.assertEqual(self.parse({'tags': ['1', '2']})['tags'], [1, 2])
+        self.assertEqual(self.parse({'tags': '[1, 2]'})['tags'], [1, 2])
@@ -0,0 +1,50 @@
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Favorite, Recipe
+from users.models import User
+
+
+class SharedResponseTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='password',
+            first_name='reader',
+            last_name='reader'
+        )
+        self.recipe = Recipe.objects.create(
+            author=self.user,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+            image='recipes/image/recipe.png'
+        )
+        Favorite.objects.create(user=self.user, recipe=self.recipe)
+
+    def test_anonymous_shared_list_is_public(self):
+        response = self.client.get('/api/recipes/?shared=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Cache-Control'].startswith('public'))
+        self.assertNotIn('is_favorited', response.data['results'][0])
+
+    def test_authenticated_shared_list_is_private(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.get(f'/api/recipes/{self.recipe.id}/?shared=1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+        self.assertNotIn('is_favorited', response.data)
+
+    def test_viewer_filters_rejected_in_shared_mode(self):
+        self.client.force_authenticate(self.user)
+        for name in ('is_favorited', 'is_in_shopping_cart'):
+            response = self.client.get(f'/api/recipes/?shared=1&{name}=1')
+            self.assertEqual(
+                response.status_code, status.HTTP_400_BAD_REQUEST
+            )
+
+    def test_anonymous_needs_shared_mode(self):
+        response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
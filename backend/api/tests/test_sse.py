@@ -0,0 +1,128 @@
+import asyncio
+import json
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api import sse
+from recipes import outbox
+from recipes.models import Change
+from users.models import EventTicket, User
+
+
+async def stream(messages, headers=(), query=b''):
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await sse.events_app({
+        'type': 'http',
+        'path': '/api/events/',
+        'headers': list(headers),
+        'query_string': query,
+    }, receive, send)
+
+
+def events(messages):
+    body = b''.join(
+        message.get('body', b'') for message in messages
+        if message['type'] == 'http.response.body'
+    ).decode()
+    return [
+        json.loads(line[len('data: '):]) for line in body.splitlines()
+        if line.startswith('data: ')
+    ]
+
+
+@override_settings(EVENTS_MAX_AGE=0.2, EVENTS_HEARTBEAT=0.1)
+class EventStreamTests(APITestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='password',
+            first_name='reader',
+            last_name='reader'
+        )
+        patcher = mock.patch.object(sse, 'broker', sse.Broker())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def connect(self, headers=(), query=b''):
+        messages = []
+        async_to_sync(stream)(messages, headers, query)
+        return messages
+
+    def ticket(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post('/api/events/ticket/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        return response.data['ticket']
+
+    def test_ticket_is_single_use(self):
+        query = f'ticket={self.ticket()}'.encode()
+        self.assertEqual(self.connect(query=query)[0]['status'], 200)
+        self.assertEqual(self.connect(query=query)[0]['status'], 401)
+
+    def test_expired_ticket_is_rejected(self):
+        key = self.ticket()
+        EventTicket.objects.filter(key=key).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        messages = self.connect(query=f'ticket={key}'.encode())
+        self.assertEqual(messages[0]['status'], 401)
+        self.assertFalse(EventTicket.objects.filter(key=key).exists())
+
+    def test_token_is_not_accepted_in_query(self):
+        token = Token.objects.create(user=self.user)
+        messages = self.connect(query=f'token={token.key}'.encode())
+        self.assertEqual(messages[0]['status'], 401)
+        messages = self.connect(headers=[
+            (b'authorization', f'Token {token.key}'.encode())
+        ])
+        self.assertEqual(messages[0]['status'], 200)
+
+    @override_settings(EVENTS_BATCH_SIZE=2)
+    def test_replay_pages_through_missed_changes(self):
+        for object_id in range(6):
+            Change.objects.create(
+                entity=Change.FAVORITE,
+                action=Change.CREATE,
+                object_id=object_id,
+                user_id=self.user.id
+            )
+        outbox.sequence()
+        last = outbox.last_position()
+        messages = self.connect(
+            headers=[(b'last-event-id', str(last - 5).encode())],
+            query=f'ticket={self.ticket()}'.encode()
+        )
+        self.assertEqual(
+            [event['position'] for event in events(messages)],
+            list(range(last - 4, last + 1))
+        )
+
+    def test_broker_falls_back_to_polling_when_listener_fails(self):
+        broker = sse.Broker()
+        broker.wake = asyncio.Event()
+        broker.listener = mock.Mock()
+        broker.listener.poll.side_effect = OSError
+        broker.listener_fd = 42
+        loop = mock.Mock()
+        with mock.patch('asyncio.get_running_loop', return_value=loop):
+            with self.assertLogs('api.sse', 'ERROR'):
+                broker.on_notify()
+        loop.remove_reader.assert_called_once_with(42)
+        self.assertIsNone(broker.listener)
+        self.assertTrue(broker.wake.is_set())
@@ -0,0 +1,74 @@
+import shutil
+import tempfile
+
+from django.test import override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.tag_registry import tag_registry
+from users.models import User
+
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABAQAAAAA3bvkkAAAA'
+    'CklEQVR4nGNgAAAAAgABSK+kcQAAAABJRU5ErkJggg=='
+)
+
+
+class StaleTagRegistryTests(APITestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='author',
+            last_name='author'
+        )
+        self.ingredient = Ingredient.objects.create(
+            name='соль', measurement_unit='г'
+        )
+        self.tag = Tag.objects.create(
+            name='завтрак', color='#E26C2D', slug='breakfast'
+        )
+        tag_registry.reload()
+        self.addCleanup(tag_registry.expire)
+        self.client.force_authenticate(self.user)
+
+    def post_recipe(self):
+        return self.client.post('/api/recipes/', {
+            'name': 'recipe',
+            'text': 'text',
+            'cooking_time': 10,
+            'image': IMAGE,
+            'tags': [self.tag.id],
+            'ingredients': [{'id': self.ingredient.id, 'amount': 1}],
+        }, format='json')
+
+    def test_validation_uses_registry_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(tag_registry.missing_ids([self.tag.id]), [])
+
+    def test_tag_deleted_in_another_worker_gives_400(self):
+        # Реестр этого процесса узнает об удалении только после коммита.
+        Tag.objects.filter(pk=self.tag.pk).delete()
+        self.assertEqual(tag_registry.missing_ids([self.tag.id]), [])
+        response = self.post_recipe()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tags', response.data)
+        self.assertFalse(Recipe.objects.exists())
+        self.assertEqual(
+            tag_registry.missing_ids([self.tag.id]), [self.tag.id]
+        )
+
+    def test_recipe_is_created_with_known_tag(self):
+        response = self.post_recipe()
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [tag['id'] for tag in response.data['tags']], [self.tag.id]
+        )
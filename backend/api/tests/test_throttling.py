@@ -0,0 +1,141 @@
+from unittest import mock
+
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from api.throttling import TokenBucketThrottle, WriteThrottle, throttle_stats
+from users.models import User
+
+
+class FakeMemcache:
+    """gets/cas/add/incr поверх словаря, как у клиента pymemcache."""
+
+    def __init__(self):
+        self.data = {}
+        self.version = 0
+
+    def gets(self, key):
+        return self.data.get(key, (None, None))
+
+    def store(self, key, value):
+        self.version += 1
+        self.data[key] = (value, self.version)
+        return True
+
+    def add(self, key, value, expire=0):
+        return key not in self.data and self.store(key, value)
+
+    def cas(self, key, value, cas, expire=0):
+        return self.gets(key)[1] == cas and self.store(key, value)
+
+    def incr(self, key, value):
+        if key not in self.data:
+            return None
+        self.store(key, self.data[key][0] + value)
+        return self.data[key][0]
+
+    def get_many(self, keys):
+        return {key: self.data[key][0] for key in keys if key in self.data}
+
+
+@mock.patch.dict(
+    TokenBucketThrottle.THROTTLE_RATES,
+    {'user_write': '3/min', 'subscribe': '1/min'}
+)
+class WriteThrottleTests(APITestCase):
+
+    def setUp(self):
+        self.user, self.first, self.second = (
+            User.objects.create_user(
+                username=name,
+                email=f'{name}@example.com',
+                password='password',
+                first_name=name,
+                last_name=name
+            )
+            for name in ('reader', 'first', 'second')
+        )
+        self.client.force_authenticate(self.user)
+        self.memcache = FakeMemcache()
+        patcher = mock.patch(
+            'api.throttling.memcached', return_value=self.memcache
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def subscribe(self, author):
+        return self.client.post(f'/api/users/{author.id}/subscribe/')
+
+    def tokens(self, scope):
+        value, _ = self.memcache.gets(f'throttle_{scope}_{self.user.id}')
+        return float(value.split()[0])
+
+    def check(self):
+        request = mock.Mock(method='POST', user=self.user)
+        view = mock.Mock(action='subscribe', throttle_scopes={
+            'subscribe': 'subscribe'
+        })
+        throttle = WriteThrottle()
+        return throttle, throttle.allow_request(request, view)
+
+    def test_action_bucket_limits_requests(self):
+        self.assertEqual(
+            self.subscribe(self.first).status_code, status.HTTP_201_CREATED
+        )
+        response = self.subscribe(self.second)
+        self.assertEqual(
+            response.status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_rejected_request_keeps_other_tokens(self):
+        self.subscribe(self.first)
+        for _ in range(3):
+            self.subscribe(self.second)
+        self.assertAlmostEqual(self.tokens('user_write'), 2, places=2)
+        self.assertLess(self.tokens('subscribe'), 1)
+
+    def test_check_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            throttle, allowed = self.check()
+        self.assertTrue(allowed)
+        throttle, allowed = self.check()
+        self.assertFalse(allowed)
+        self.assertGreater(throttle.wait(), 0)
+
+    @mock.patch.dict(
+        TokenBucketThrottle.THROTTLE_RATES, {'subscribe': '5/min'}
+    )
+    def test_lost_race_refunds_consumed_tokens(self):
+        self.check()
+        cas = self.memcache.cas
+        calls = []
+
+        def flaky_cas(key, value, token, expire=0):
+            calls.append(key)
+            if key.startswith('throttle_user_write') and len(calls) == 2:
+                self.memcache.store(key, self.memcache.gets(key)[0])
+                return False
+            return cas(key, value, token, expire)
+
+        with mock.patch.object(self.memcache, 'cas', flaky_cas):
+            _, allowed = self.check()
+        self.assertTrue(allowed)
+        self.assertAlmostEqual(self.tokens('user_write'), 1, places=2)
+        self.assertAlmostEqual(self.tokens('subscribe'), 3, places=2)
+
+    def test_counters_are_shared(self):
+        self.check()
+        self.check()
+        self.assertEqual(throttle_stats(), {
+            'user_write.allowed': 2,
+            'subscribe.allowed': 1,
+            'subscribe.throttled': 1,
+        })
+
+    def test_unavailable_cache_lets_requests_through(self):
+        for failure in ({'side_effect': OSError}, {'return_value': None}):
+            with mock.patch.object(self.memcache, 'gets', **failure):
+                with self.assertLogs('api.throttling', 'WARNING'):
+                    _, allowed = self.check()
+            self.assertTrue(allowed)
@@ -0,0 +1,175 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import SimpleRateThrottle
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = 'throttle_stats_%(scope)s_%(outcome)s'
+
+OUTCOMES = ('allowed', 'throttled')
+
+
+def memcached():
+    """Клиент pymemcache общего кэша THROTTLE_CACHE.
+
+    Нужны gets/cas и incr, которых нет в API кэша Django, поэтому
+    используется клиент, созданный бэкендом (он свой у каждого потока).
+    """
+    return caches[settings.THROTTLE_CACHE]._cache
+
+
+def count(client, scope, outcome):
+    key = STATS_KEY % {'scope': scope, 'outcome': outcome}
+    if client.incr(key, 1) is None and not client.add(key, 1):
+        client.incr(key, 1)
+
+
+def throttle_stats():
+    """Счётчики решений, общие для всех воркеров."""
+    keys = {
+        STATS_KEY % {'scope': scope, 'outcome': outcome}:
+        f'{scope}.{outcome}'
+        for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+        for outcome in OUTCOMES
+    }
+    values = memcached().get_many(list(keys))
+    return {name: int(values[key]) for key, name in keys.items()
+            if key in values}
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Вёдра токенов в общем для воркеров memcached.
+
+    Ёмкость ведра равна числу запросов из ставки, токены
+    восстанавливаются равномерно за её период. Состояние ведра
+    («токены время») меняется через gets/cas: проигравший гонку
+    перечитывает вёдра и пробует снова. Токены списываются, только если
+    запрос пропускает каждое ведро; ключ живёт один период, после
+    которого ведро всё равно было бы полным. Проверка не обращается к БД,
+    а при недоступном memcached запрос пропускается.
+    """
+    attempts = 5
+
+    def __init__(self):
+        self.wait_time = 0
+
+    def get_scopes(self, request, view):
+        return ()
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def get_rates(self, request, view):
+        rates = {}
+        for scope in self.get_scopes(request, view):
+            if scope not in self.THROTTLE_RATES:
+                continue
+            self.scope = scope
+            rates[self.get_cache_key(request, view)] = (
+                scope, *self.parse_rate(self.THROTTLE_RATES[scope])
+            )
+        return rates
+
+    def allow_request(self, request, view):
+        rates = self.get_rates(request, view)
+        if not rates:
+            return True
+        try:
+            client = memcached()
+            throttled = self.consume(client, rates)
+            for scope, _, _ in rates.values():
+                count(client, scope, 'throttled' if scope in throttled
+                      else 'allowed')
+        except Exception as error:
+            logger.warning('Ограничитель запросов недоступен: %r', error)
+            return True
+        self.wait_time = max(throttled.values(), default=0)
+        return not throttled
+
+    def consume(self, client, rates):
+        """Списывает по токену из каждого ведра; возвращает {scope:
+        секунды ожидания} для вёдер, которые запрос не пропускают."""
+        for _ in range(self.attempts):
+            now = time.time()
+            throttled = {}
+            updates = []
+            for key, (scope, capacity, duration) in sorted(rates.items()):
+                value, cas = self.gets(client, key)
+                tokens, updated = (
+                    map(float, value.split()) if value
+                    else (capacity, now)
+                )
+                refill = capacity / duration
+                tokens = min(
+                    capacity, tokens + max(0, now - updated) * refill
+                )
+                if tokens < 1:
+                    throttled[scope] = (1 - tokens) / refill
+                updates.append((key, cas, f'{tokens - 1} {now}', duration))
+            if throttled:
+                return throttled
+            done = []
+            for key, cas, value, duration in updates:
+                if cas is None:
+                    stored = client.add(key, value, duration)
+                else:
+                    stored = client.cas(key, value, cas, duration)
+                if stored is None:
+                    raise ConnectionError('memcached не ответил')
+                if not stored:
+                    break
+                done.append((key, rates[key]))
+            else:
+                return {}
+            for key, (_, capacity, duration) in done:
+                self.refund(client, key, capacity, duration)
+        return {scope: 1 / (capacity / duration)
+                for scope, capacity, duration in rates.values()}
+
+    @staticmethod
+    def gets(client, key):
+        # HashClient отвечает None вместо (значение, cas), пока считает
+        # сервер упавшим.
+        result = client.gets(key)
+        if result is None:
+            raise ConnectionError('memcached не ответил')
+        return result
+
+    def refund(self, client, key, capacity, duration):
+        """Возвращает токен, если соседнее ведро проиграло гонку."""
+        for _ in range(self.attempts):
+            value, cas = self.gets(client, key)
+            if value is None:
+                return
+            tokens, updated = map(float, value.split())
+            value = f'{min(capacity, tokens + 1)} {updated}'
+            if client.cas(key, value, cas, duration):
+                return
+
+    def wait(self):
+        return self.wait_time
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """Общее ведро на все изменяющие запросы пользователя и ведро
+    на действие из view.throttle_scopes."""
+    scope = 'user_write'
+
+    def get_scopes(self, request, view):
+        scopes = []
+        if request.method not in SAFE_METHODS:
+            scopes.append('user_write')
+        action_scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None)
+        )
+        if action_scope:
+            scopes.append(action_scope)
+        return scopes
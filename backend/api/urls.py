@@ -2,8 +2,13 @@ from django.urls import include, path
 from rest_framework import routers
 
 from .views import (
+    BatchView,
     CustomUserViewSet,
     IngredientViewSet,
+    CatalogVersionView,
+    ChangesView,
+    EventTicketView,
+    ThrottleStatsView,
     RecipeViewSet,
     TagViewSet
 )
@@ -35,6 +40,13 @@ router_v1.register(
 
 urlpatterns = [
     path('auth/', include('djoser.urls.authtoken')),
+    path('batch/', BatchView.as_view(), name='batch'),
+    path('changes/', ChangesView.as_view(), name='changes'),
+    path(
+        'events/ticket/', EventTicketView.as_view(), name='events-ticket'
+    ),
+    path('catalog/', CatalogVersionView.as_view(), name='catalog'),
+    path('throttling/', ThrottleStatsView.as_view(), name='throttling'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
 ]
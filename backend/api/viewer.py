@@ -0,0 +1,53 @@
+from django.utils.functional import cached_property
+
+from users.models import Follow
+from recipes.models import Favorite, ShoppingCart
+
+
+class ViewerState:
+    """Множества id для флагов текущего пользователя.
+
+    Каждое грузится одним запросом при первом обращении и живёт до конца
+    запроса; в /api/batch/ общее для всех подзапросов.
+    """
+
+    def __init__(self, user):
+        self.user = user
+
+    def _ids(self, queryset, field):
+        if self.user.is_anonymous:
+            return frozenset()
+        return frozenset(
+            queryset.filter(user=self.user).values_list(field, flat=True)
+        )
+
+    @cached_property
+    def followed_author_ids(self):
+        return self._ids(Follow.objects, 'author_id')
+
+    @cached_property
+    def favorite_recipe_ids(self):
+        return self._ids(Favorite.objects, 'recipe_id')
+
+    @cached_property
+    def cart_recipe_ids(self):
+        return self._ids(ShoppingCart.objects, 'recipe_id')
+
+
+def viewer_state(request):
+    http_request = getattr(request, '_request', request)
+    state = getattr(http_request, 'viewer_state', None)
+    if state is None:
+        state = ViewerState(request.user)
+        http_request.viewer_state = state
+    return state
+
+
+def is_batched(request):
+    http_request = getattr(request, '_request', request)
+    return getattr(http_request, 'batched', False)
+
+
+def is_shared_request(request):
+    """Общий ответ: без полей и фильтров, зависящих от читателя."""
+    return request.query_params.get('shared') in ('1', 'true')
@@ -1,37 +1,74 @@
+import logging
+from urllib.parse import urlsplit
+
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.http import HttpResponse
-from django.db.models import Sum
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from django.db.models import Prefetch, Q, Sum
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
 
-from users.models import Follow, User
-from api.pagination import PageNumberLimitPagination
+from users.models import Follow, FollowSuggestion, User
+from api.parsers import MultiPartJSONParser
+from api.pagination import FeedPagination, PageNumberLimitPagination
 from api.filters import IngredientFilter, RecipeFilter
-from api.permissions import IsAdminOrReadOnly
+from api.fieldsets import (
+    load_subscription_recipes,
+    plan_recipes,
+    plan_subscriptions,
+    plan_users
+)
+from api.permissions import IsAdminOrReadOnly, IsAuthenticatedOrShared
+from api.sse import issue_ticket
+from api.throttling import WriteThrottle, throttle_stats
+from api.viewer import is_shared_request, viewer_state
 # , IsAuthorOrReadOnly
 from api.serializers import (
     CreateRecipeSerializer,
     ShoppingCartSerializer,
     CustomUserSerializer,
+    SimilarRecipeSerializer,
+    FollowSuggestionSerializer,
+    ChangeSerializer,
     IngredientSerializer,
     RecipeReadSerializer,
     FavoriteSerializer,
     FollowSerializer,
     TagSerializer,
 )
+from recipes.catalog import catalog_url, current_version
+from recipes.feed import pull_popular_authors
+from recipes.ingredient_index import ingredient_index
+from recipes.tag_registry import load_tag_ids
 from recipes.models import (
     IngredientRecipe,
     ShoppingCart,
     Ingredient,
+    SimilarRecipe,
+    FeedEntry,
+    Change,
     Favorite,
     Recipe,
     Tag
 )
 
+logger = logging.getLogger(__name__)
+
+
+def parse_id_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+VIEWER_FILTERS = ('is_favorited', 'is_in_shopping_cart')
+
 
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
@@ -39,6 +76,14 @@ class CustomUserViewSet(UserViewSet):
     pagination_class = PageNumberLimitPagination
     lookup_field = 'id'
     permission_classes = (IsAuthenticated,)
+    throttle_classes = (WriteThrottle,)
+    throttle_scopes = {'subscribe': 'subscribe'}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return plan_users(queryset, self.request)
 
     @staticmethod
     def subscribe_error_response(
@@ -75,8 +120,11 @@ class CustomUserViewSet(UserViewSet):
     @action(detail=False, methods=['get'])
     def subscriptions(self, request):
         user = request.user
-        queryset = Follow.objects.filter(user=user)
+        queryset = plan_subscriptions(
+            Follow.objects.filter(user=user), request
+        )
         pages = self.paginate_queryset(queryset)
+        load_subscription_recipes(pages, request)
         serializer = FollowSerializer(
             pages,
             many=True,
@@ -84,21 +132,120 @@ class CustomUserViewSet(UserViewSet):
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def suggestions(self, request):
+        queryset = FollowSuggestion.objects.filter(
+            user=request.user
+        ).exclude(
+            author__following__user=request.user
+        ).select_related('author')
+        pages = self.paginate_queryset(queryset)
+        serializer = FollowSuggestionSerializer(
+            pages,
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
 
 class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     # permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
-    permission_classes = (IsAuthenticated,)
+    permission_classes = (IsAuthenticatedOrShared,)
     serializer_class = CreateRecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = PageNumberLimitPagination
+    parser_classes = (JSONParser, MultiPartJSONParser)
+    throttle_classes = (WriteThrottle,)
+    throttle_scopes = {
+        'create': 'recipe_create',
+        'favorite': 'favorite',
+        'destroy_favorite': 'favorite',
+        'shopping_cart': 'shopping_cart',
+        'destroy_shopping_cart': 'shopping_cart',
+    }
 
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return RecipeReadSerializer
         return CreateRecipeSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.method != 'GET':
+            return queryset
+        return plan_recipes(
+            queryset, self.request, is_shared_request(self.request)
+        )
+
+    def filter_queryset(self, queryset):
+        if is_shared_request(self.request) and any(
+            name in self.request.query_params for name in VIEWER_FILTERS
+        ):
+            raise ValidationError({
+                'errors': 'Фильтры по избранному и списку покупок '
+                          'недоступны в общем ответе (shared=1)'
+            })
+        return super().filter_queryset(queryset)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['shared'] = is_shared_request(self.request)
+        return context
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Общий ответ не зависит от читателя, но публичным для
+        промежуточных кэшей помечается только анонимный запрос."""
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if (
+            request.method == 'GET'
+            and response.status_code == status.HTTP_200_OK
+            and self.action in ('list', 'retrieve')
+            and is_shared_request(request)
+        ):
+            scope = 'public' if request.user.is_anonymous else 'private'
+            response['Cache-Control'] = (
+                f'{scope}, max-age={settings.SHARED_RESPONSE_MAX_AGE}'
+            )
+        return response
+
+    @action(detail=False, methods=("GET",))
+    def state(self, request):
+        try:
+            ids = parse_id_list(request.query_params.get('ids', ''))
+        except ValueError:
+            return Response(
+                {'errors': 'Ожидаются целые числа'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > settings.RECIPE_STATE_MAX_IDS:
+            return Response(
+                {'errors': 'Слишком много рецептов в запросе'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        user = request.user
+        favorited = set(Favorite.objects.filter(
+            user=user, recipe_id__in=ids
+        ).values_list('recipe_id', flat=True))
+        in_cart = set(ShoppingCart.objects.filter(
+            user=user, recipe_id__in=ids
+        ).values_list('recipe_id', flat=True))
+        subscribed = set(Recipe.objects.filter(
+            id__in=ids, author__following__user=user
+        ).values_list('id', flat=True))
+        return Response([
+            {
+                'id': recipe_id,
+                'is_favorited': recipe_id in favorited,
+                'is_in_shopping_cart': recipe_id in in_cart,
+                'is_subscribed': recipe_id in subscribed,
+            }
+            for recipe_id in ids
+        ])
+
     def create_list_of_products(self, ingredients):
         list_of_products = ["Купить в магазине:"]
         for ingredient in ingredients:
@@ -112,6 +259,87 @@ class RecipeViewSet(viewsets.ModelViewSet):
             )
         return "\n".join(list_of_products)
 
+    @action(detail=False, methods=("GET",))
+    def feed(self, request):
+        pull_popular_authors(request.user)
+        queryset = FeedEntry.objects.filter(
+            user=request.user
+        ).prefetch_related(Prefetch(
+            'recipe', queryset=plan_recipes(Recipe.objects.all(), request)
+        ))
+        paginator = FeedPagination()
+        entries = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = RecipeReadSerializer(
+            [entry.recipe for entry in entries],
+            many=True,
+            context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=("GET",))
+    def trending(self, request):
+        queryset = self.filter_queryset(
+            self.get_queryset().filter(popularity__gt=0)
+        ).order_by('-popularity', '-id')
+        pages = self.paginate_queryset(queryset)
+        serializer = RecipeReadSerializer(
+            pages,
+            many=True,
+            context={'request': request}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=("GET",))
+    def by_ingredients(self, request):
+        try:
+            ingredient_ids = parse_id_list(
+                request.query_params.get('ingredients', '')
+            )
+            max_missing = request.query_params.get('max_missing')
+            if max_missing is not None:
+                max_missing = int(max_missing)
+        except ValueError:
+            return Response(
+                {'errors': 'Ожидаются целые числа'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'Укажите ингредиенты'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        ranked = ingredient_index.search(ingredient_ids, max_missing)
+        page = self.paginate_queryset(ranked)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, _, _ in page]
+        )
+        load_tag_ids(recipes.values())
+        data = []
+        for recipe_id, covered, missing in page:
+            if recipe_id not in recipes:
+                continue
+            item = RecipeReadSerializer(
+                recipes[recipe_id],
+                context={'request': request}
+            ).data
+            item['covered'] = covered
+            item['missing'] = missing
+            data.append(item)
+        return self.get_paginated_response(data)
+
+    @action(detail=True, methods=("GET",))
+    def similar(self, request, pk):
+        recipe = get_object_or_404(Recipe, id=pk)
+        queryset = SimilarRecipe.objects.filter(
+            recipe=recipe
+        ).select_related('similar')
+        serializer = SimilarRecipeSerializer(
+            queryset[:settings.SIMILAR_RECIPES_TOP_K],
+            many=True,
+            context={'request': request}
+        )
+        return Response(serializer.data)
+
     @action(detail=False, methods=("GET",))
     def download_shopping_cart(self, request):
         ingredients = IngredientRecipe.objects.filter(
@@ -253,6 +481,151 @@ class RecipeViewSet(viewsets.ModelViewSet):
     #     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class ThrottleStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(throttle_stats())
+
+
+class EventTicketView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        ticket = issue_ticket(request.user)
+        response = Response(
+            {'ticket': ticket.key, 'expires_in': settings.EVENTS_TICKET_TTL},
+            status=status.HTTP_201_CREATED
+        )
+        response['Cache-Control'] = 'no-store'
+        return response
+
+
+class ChangesView(APIView):
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(
+                int(request.query_params.get(
+                    'limit', settings.CHANGES_PAGE_SIZE
+                )),
+                settings.CHANGES_MAX_PAGE_SIZE
+            )
+        except ValueError:
+            return Response(
+                {'errors': 'Ожидаются целые числа'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        oldest = Change.objects.filter(
+            position__isnull=False
+        ).order_by('position').values_list('position', flat=True).first()
+        if since and oldest and since < oldest - 1:
+            return Response(
+                {'errors': 'Курсор устарел, загрузите данные заново',
+                 'reset': True},
+                status=status.HTTP_410_GONE
+            )
+        visible = Q(public=True)
+        if request.user.is_authenticated:
+            visible |= Q(user_id=request.user.id)
+        changes = list(Change.objects.filter(
+            visible,
+            position__gt=since
+        ).order_by('position')[:limit + 1])
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        return Response({
+            'cursor': changes[-1].position if changes else since,
+            'has_more': has_more,
+            'results': ChangeSerializer(changes, many=True).data
+        })
+
+
+class CatalogVersionView(APIView):
+
+    def get(self, request):
+        version = current_version()
+        response = Response({
+            'version': version,
+            'url': request.build_absolute_uri(catalog_url(version))
+        })
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class BatchView(APIView):
+    """Выполняет несколько GET-запросов к API за один запрос.
+
+    Подзапросы идут прямо во view, минуя middleware, с уже
+    аутентифицированным пользователем и общим ViewerState.
+    """
+
+    def post(self, request):
+        paths = request.data.get('requests') if isinstance(
+            request.data, dict
+        ) else None
+        if not isinstance(paths, list) or not paths:
+            return Response(
+                {'errors': 'Передайте непустой список requests'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(paths) > settings.BATCH_MAX_REQUESTS:
+            return Response(
+                {'errors': 'Слишком много подзапросов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response([self.dispatch_one(request, path) for path in paths])
+
+    def dispatch_one(self, request, path):
+        if not isinstance(path, str):
+            return {'path': path, 'status': status.HTTP_400_BAD_REQUEST}
+        url = urlsplit(path)
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            match = None
+        if (
+            match is None
+            or 'api' not in match.namespaces
+            or match.url_name == 'batch'
+        ):
+            return {'path': path, 'status': status.HTTP_404_NOT_FOUND}
+
+        sub_request = HttpRequest()
+        sub_request.method = 'GET'
+        sub_request.path = sub_request.path_info = url.path
+        sub_request.GET = QueryDict(url.query)
+        sub_request.META = {
+            key: value for key, value in request.META.items()
+            if key not in ('CONTENT_LENGTH', 'CONTENT_TYPE')
+        }
+        sub_request.META.update(
+            REQUEST_METHOD='GET',
+            PATH_INFO=url.path,
+            QUERY_STRING=url.query
+        )
+        sub_request.resolver_match = match
+        sub_request.user = request.user
+        sub_request._force_auth_user = request.user
+        sub_request._force_auth_token = request.auth
+        sub_request.viewer_state = viewer_state(request)
+        sub_request.batched = True
+        try:
+            response = match.func(sub_request, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception('Ошибка подзапроса %s', path)
+            return {
+                'path': path,
+                'status': status.HTTP_500_INTERNAL_SERVER_ERROR
+            }
+        if hasattr(response, 'data'):
+            body = response.data
+        else:
+            body = response.content.decode(response.charset)
+        return {'path': path, 'status': response.status_code, 'body': body}
+
+
 class TagViewSet(viewsets.ModelViewSet):
     serializer_class = TagSerializer
     queryset = Tag.objects.all()
@@ -24,7 +24,8 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'djoser',
     'django_filters',
-    'drf_extra_fields.fields'
+    'drf_extra_fields.fields',
+    'admin_auto_filters'
 ]
 
 MIDDLEWARE = [
@@ -35,6 +36,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.profiling.QueryProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -98,8 +100,31 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'user_write': os.getenv('THROTTLE_USER_WRITE', default='120/min'),
+        'recipe_create': os.getenv('THROTTLE_RECIPE_CREATE', default='10/min'),
+        'favorite': os.getenv('THROTTLE_FAVORITE', default='30/min'),
+        'shopping_cart': os.getenv('THROTTLE_SHOPPING_CART', default='30/min'),
+        'subscribe': os.getenv('THROTTLE_SUBSCRIBE', default='30/min'),
+    },
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.getenv('THROTTLE_CACHE_LOCATION', '127.0.0.1:11211'),
+        'OPTIONS': {
+            'connect_timeout': 0.1,
+            'timeout': 0.1,
+            'no_delay': True,
+        },
+    },
+}
+THROTTLE_CACHE = 'throttle'
+
 
 DJOSER = {
     'LOGIN_FIELD': 'email' or 'username',
@@ -133,6 +158,14 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+RECIPE_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+
+RECIPE_IMAGE_MAX_SIDE = 4096
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LENGTH_TEXT_150 = 150
@@ -140,3 +173,85 @@ LENGTH_TEXT_150 = 150
 LENGTH_TEXT_254 = 254
 
 RECIPES_COUNT = 6
+
+FEED_FANOUT_THRESHOLD = 1000
+
+FEED_FANOUT_LEAVE_THRESHOLD = 800
+
+FEED_BACKFILL = 100
+
+FEED_BATCH_SIZE = 1000
+
+POPULARITY_FAVORITE_WEIGHT = 1.0
+
+POPULARITY_CART_WEIGHT = 0.5
+
+POPULARITY_HALF_LIFE_HOURS = 72
+
+POPULARITY_DECAY_INTERVAL_HOURS = 1
+
+INGREDIENT_INDEX_TTL = 300
+
+SIMILAR_RECIPES_TOP_K = 10
+
+SIMILAR_RECIPES_TAG_BOOST = 0.05
+
+SHARED_RESPONSE_MAX_AGE = 60
+
+RECIPE_STATE_MAX_IDS = 100
+
+CHANGES_PAGE_SIZE = 100
+
+CHANGES_MAX_PAGE_SIZE = 1000
+
+CHANGES_SEQUENCE_BATCH_SIZE = 10000
+
+CHANGES_SEQUENCE_INTERVAL = 0.5
+
+CHANGES_RETENTION_DAYS = 30
+
+QUERY_PROFILING = os.getenv('QUERY_PROFILING', default='') == '1'
+
+QUERY_PROFILING_SLOW_MS = float(
+    os.getenv('QUERY_PROFILING_SLOW_MS', default=100)
+)
+
+QUERY_PROFILING_FLUSH_SECONDS = 10
+
+QUERY_PROFILING_DIR = os.getenv(
+    'QUERY_PROFILING_DIR', default=os.path.join(BASE_DIR, 'query_profile')
+)
+
+FOLLOW_SUGGESTIONS_TOP_K = 20
+
+FOLLOW_SUGGESTIONS_FOLLOW_WEIGHT = 1.0
+
+FOLLOW_SUGGESTIONS_FAVORITE_WEIGHT = 0.5
+
+DAILY_STATS_BATCH_SIZE = 10000
+
+DAILY_STATS_DASHBOARD_TOP = 10
+
+TAG_REGISTRY_CHECK_INTERVAL = 30
+
+TAG_REGISTRY_MISS_INTERVAL = 1
+
+TAG_REGISTRY_TTL = 300
+
+BATCH_MAX_REQUESTS = 20
+
+EVENTS_HEARTBEAT = 15
+
+EVENTS_POLL_INTERVAL = 5
+
+EVENTS_MAX_AGE = 600
+
+EVENTS_RETRY_MS = 5000
+
+EVENTS_MAX_CONNECTIONS = 500
+
+EVENTS_MAX_PER_USER = 5
+
+EVENTS_BATCH_SIZE = 1000
+
+EVENTS_TICKET_TTL = 30
@@ -1,7 +1,18 @@
+from admin_auto_filters.filters import AutocompleteFilter
 from django.contrib import admin
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.template.response import TemplateResponse
+from django.utils import timezone
 
 from recipes.models import (
+    DailyIngredientStats,
+    DailyRecipeStats,
     IngredientRecipe,
+    StatsWatermark,
+    DailyStats,
     ShoppingCart,
     Ingredient,
     Favorite,
@@ -10,32 +21,60 @@ from recipes.models import (
 )
 
 
+class AuthorFilter(AutocompleteFilter):
+    title = 'Автор'
+    field_name = 'author'
+
+
+class UserFilter(AutocompleteFilter):
+    title = 'Пользователь'
+    field_name = 'user'
+
+
+class RecipeFilter(AutocompleteFilter):
+    title = 'Рецепт'
+    field_name = 'recipe'
+
+
 class IngredientInline(admin.TabularInline):
     model = IngredientRecipe
+    autocomplete_fields = ('ingredient',)
     extra = 1
 
 
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'name',
-        'author'
+        'author',
+        'get_favorites',
+        'get_ingredients'
     )
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
     search_fields = (
-        'author',
         'name',
-        'tags'
+        'author__username'
     )
     list_filter = (
-        'author',
-        'name',
+        AuthorFilter,
         'tags'
     )
     inlines = (IngredientInline,)
     empty_value_display = '-пусто-'
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        favorites_count = Favorite.objects.filter(
+            recipe=OuterRef('pk')
+        ).values('recipe').annotate(count=Count('id')).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(Subquery(favorites_count), 0)
+        ).prefetch_related('ingredients')
 
     def get_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
     get_favorites.short_description = 'Избранное'
+    get_favorites.admin_order_field = 'favorites_count'
 
     def get_ingredients(self, obj):
         return ', '.join([
@@ -58,25 +97,95 @@ class TagAdmin(admin.ModelAdmin):
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
-    search_fields = ('name',)
-    list_filter = ('name',)
+    search_fields = ('^name',)
+    ordering = ('name',)
     empty_value_display = '-пусто-'
+    show_full_result_count = False
 
 
 class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
-    search_fields = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    list_filter = (UserFilter, RecipeFilter)
+    search_fields = ('user__username', 'recipe__name')
     empty_value_display = '-пусто-'
+    show_full_result_count = False
 
 
 class ShoppingCartAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'user')
-    list_filter = ('recipe', 'user')
-    search_fields = ('user', )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
+    list_filter = (RecipeFilter, UserFilter)
+    search_fields = ('user__username', 'recipe__name')
     empty_value_display = '-пусто-'
-
-
+    show_full_result_count = False
+
+
+class DailyStatsAdmin(admin.ModelAdmin):
+    """Сводка для операторов: читает только дневные сводные таблицы."""
+    periods = (7, 30, 90)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        try:
+            days = int(request.GET.get('days', self.periods[1]))
+        except ValueError:
+            days = self.periods[1]
+        if days not in self.periods:
+            days = self.periods[1]
+        since = timezone.localdate() - timezone.timedelta(days=days - 1)
+        top = settings.DAILY_STATS_DASHBOARD_TOP
+        daily = list(DailyStats.objects.filter(date__gte=since))
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Статистика',
+            'opts': self.model._meta,
+            'periods': self.periods,
+            'days': days,
+            'daily': daily,
+            'totals': {
+                field: sum(getattr(row, field) for row in daily)
+                for field in (
+                    'recipes_created',
+                    'favorites_added',
+                    'shopping_carts_added'
+                )
+            },
+            'top_favorited': DailyRecipeStats.objects.filter(
+                date__gte=since
+            ).values('recipe_id', 'recipe__name').annotate(
+                total=Sum('favorites')
+            ).filter(total__gt=0).order_by('-total')[:top],
+            'top_carted': DailyIngredientStats.objects.filter(
+                date__gte=since
+            ).values(
+                'ingredient__name', 'ingredient__measurement_unit'
+            ).annotate(
+                total=Sum('shopping_carts')
+            ).order_by('-total')[:top],
+            'watermark': StatsWatermark.objects.filter(
+                name='daily_stats'
+            ).first(),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(
+            request, 'admin/recipes/dailystats/dashboard.html', context
+        )
+
+
+admin.site.register(DailyStats, DailyStatsAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
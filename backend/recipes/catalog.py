@@ -0,0 +1,106 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import Ingredient, Tag
+
+CATALOG_DIR = 'catalog'
+VERSION_FILE = 'VERSION'
+
+_version = {'mtime': None, 'value': None}
+
+
+def catalog_path(*parts):
+    return os.path.join(settings.MEDIA_ROOT, CATALOG_DIR, *parts)
+
+
+def catalog_url(version):
+    return f'{settings.MEDIA_URL}{CATALOG_DIR}/catalog.{version}.json'
+
+
+def _write(path, data):
+    with tempfile.NamedTemporaryFile(
+        dir=os.path.dirname(path), prefix='.tmp-', delete=False
+    ) as output:
+        output.write(data)
+    os.chmod(output.name, 0o644)
+    os.replace(output.name, path)
+
+
+def _read_version():
+    try:
+        with open(catalog_path(VERSION_FILE)) as source:
+            return source.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def build_catalog():
+    """Собирает снимок тегов и ингредиентов и возвращает его версию.
+
+    Рядом с JSON кладётся заранее сжатая .gz-копия для gzip_static,
+    имя файла содержит хэш содержимого. Предыдущая версия остаётся
+    на диске до следующей публикации: клиенты, только что получившие
+    её номер, ещё успевают её скачать.
+    """
+    document = {
+        'tags': list(Tag.objects.order_by('id').values(
+            'id', 'name', 'color', 'slug'
+        )),
+        'ingredients': list(Ingredient.objects.order_by('id').values(
+            'id', 'name', 'measurement_unit'
+        )),
+    }
+    data = json.dumps(
+        document, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+    version = hashlib.sha256(data).hexdigest()[:16]
+    os.makedirs(catalog_path(), exist_ok=True)
+    previous = _read_version()
+    name = f'catalog.{version}.json'
+    _write(catalog_path(name), data)
+    _write(catalog_path(f'{name}.gz'), gzip.compress(data, 9))
+    _write(catalog_path(VERSION_FILE), version.encode())
+    keep = {f'catalog.{kept}.json' for kept in (version, previous)}
+    for entry in os.scandir(catalog_path()):
+        if (
+            entry.name.startswith('catalog.')
+            and entry.name.removesuffix('.gz') not in keep
+        ):
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+    return version
+
+
+def current_version():
+    path = catalog_path(VERSION_FILE)
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return build_catalog()
+    if mtime != _version['mtime']:
+        with open(path) as source:
+            _version['value'] = source.read().strip()
+        _version['mtime'] = mtime
+    return _version['value']
+
+
+def schedule_rebuild():
+    """Пересобирает каталог после коммита текущей транзакции.
+
+    Сборка ставится в очередь соединения не больше одного раза
+    на транзакцию; при откате очередь очищается вместе с ней.
+    """
+    connection = transaction.get_connection()
+    if any(
+        callback is build_catalog for _, callback in connection.run_on_commit
+    ):
+        return
+    transaction.on_commit(build_catalog)
@@ -0,0 +1,193 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from recipes.models import FeedAuthor, FeedEntry, Recipe
+from users.models import Follow
+
+
+def is_popular(author_id):
+    return FeedAuthor.objects.filter(
+        author_id=author_id, popular_since__isnull=False
+    ).exists()
+
+
+@transaction.atomic
+def add_followers(author_id, delta):
+    """Меняет счётчик подписчиков автора на delta и переключает способ
+    доставки его рецептов.
+
+    Автор становится популярным при FEED_FANOUT_THRESHOLD подписчиков и
+    перестаёт им быть ниже FEED_FANOUT_LEAVE_THRESHOLD, чтобы авторы у
+    порога не переключались на каждой подписке. Уходя из популярных,
+    автор раскладывает подписчикам рецепты, вышедшие без раскладки.
+    """
+    authors = FeedAuthor.objects.select_for_update()
+    if delta > 0:
+        author, _ = authors.get_or_create(author_id=author_id)
+    else:
+        # При удалении автора его строка могла уйти раньше подписок.
+        author = authors.filter(author_id=author_id).first()
+        if author is None:
+            return
+    author.followers = max(0, author.followers + delta)
+    popular_since = author.popular_since
+    if (
+        popular_since is None
+        and author.followers >= settings.FEED_FANOUT_THRESHOLD
+    ):
+        author.popular_since = timezone.now()
+    elif (
+        popular_since is not None
+        and author.followers < settings.FEED_FANOUT_LEAVE_THRESHOLD
+    ):
+        author.popular_since = None
+        transaction.on_commit(
+            lambda: fan_out_since(author_id, popular_since)
+        )
+    author.save(update_fields=('followers', 'popular_since'))
+
+
+def fan_out_recipe(recipe):
+    """Раскладывает новый рецепт по лентам подписчиков автора.
+
+    Для популярных авторов раскладка не делается: их рецепты
+    подтягиваются в ленту читателя при чтении (pull_popular_authors).
+    """
+    if is_popular(recipe.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    entries = (
+        FeedEntry(
+            user_id=user_id,
+            recipe_id=recipe.id,
+            author_id=recipe.author_id,
+            pub_date=recipe.pub_date
+        )
+        for user_id in follower_ids.iterator()
+    )
+    _bulk_create(entries)
+
+
+def fan_out_since(author_id, since):
+    """Раскладывает подписчикам рецепты автора, вышедшие с since
+    (не больше FEED_BACKFILL последних): пока автор был популярным,
+    они попадали только в ленты, которые в это время читали."""
+    if is_popular(author_id):
+        return
+    recipes = list(Recipe.objects.filter(
+        author_id=author_id, pub_date__gte=since
+    ).order_by('-pub_date', '-id').values_list(
+        'id', 'pub_date'
+    )[:settings.FEED_BACKFILL])
+    if not recipes:
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    _bulk_create(
+        FeedEntry(
+            user_id=user_id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for user_id in follower_ids.iterator()
+        for recipe_id, pub_date in recipes
+    )
+
+
+def backfill_author(user_id, author_id):
+    """Добавляет в ленту последние FEED_BACKFILL рецептов автора."""
+    backfill_follows([(user_id, author_id)])
+
+
+def backfill_follows(pairs):
+    """backfill_author для пачки новых подписок (user_id, author_id):
+    последние рецепты каждого автора читаются одним запросом."""
+    followers = defaultdict(list)
+    for user_id, author_id in pairs:
+        followers[author_id].append(user_id)
+    for author_id, user_ids in followers.items():
+        recipes = list(Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date', '-id'
+        ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL])
+        _bulk_create(
+            FeedEntry(
+                user_id=user_id,
+                recipe_id=recipe_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for user_id in user_ids
+            for recipe_id, pub_date in recipes
+        )
+
+
+def remove_author(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def pull_popular_authors(user):
+    """Догружает в ленту рецепты популярных авторов, вышедшие
+    после последней записи от каждого из них.
+
+    Список популярных авторов ведётся сигналами подписок, так что
+    на чтение не приходится агрегатов по подписчикам. Новые рецепты
+    догружаются целиком, пачками по FEED_BATCH_SIZE.
+    """
+    popular_ids = list(Follow.objects.filter(
+        user=user,
+        author_id__in=FeedAuthor.objects.filter(
+            popular_since__isnull=False
+        ).values('author_id')
+    ).values_list('author_id', flat=True))
+    if not popular_ids:
+        return
+    watermarks = dict(
+        FeedEntry.objects.filter(
+            user=user, author_id__in=popular_ids
+        ).values('author_id').annotate(
+            last=Max('pub_date')
+        ).values_list('author_id', 'last')
+    )
+    newer = Q()
+    for author_id in popular_ids:
+        if author_id not in watermarks:
+            backfill_author(user.id, author_id)
+        else:
+            newer |= Q(
+                author_id=author_id, pub_date__gte=watermarks[author_id]
+            )
+    if not newer:
+        return
+    recipes = Recipe.objects.filter(newer).values_list(
+        'id', 'author_id', 'pub_date'
+    )
+    _bulk_create(
+        FeedEntry(
+            user_id=user.id,
+            recipe_id=recipe_id,
+            author_id=author_id,
+            pub_date=pub_date
+        )
+        for recipe_id, author_id, pub_date in recipes.iterator(
+            chunk_size=settings.FEED_BATCH_SIZE
+        )
+    )
+
+
+def _bulk_create(entries):
+    batch = []
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= settings.FEED_BATCH_SIZE:
+            FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        FeedEntry.objects.bulk_create(batch, ignore_conflicts=True)
@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from recipes.models import IngredientRecipe
+
+logger = logging.getLogger(__name__)
+
+
+class IngredientIndex:
+    """Инвертированный индекс ингредиент -> отсортированные id рецептов.
+
+    Живёт в памяти процесса. Записи рецептов обновляют его точечно,
+    а раз в INGREDIENT_INDEX_TTL секунд он пересобирается целиком
+    в фоновом потоке, чтобы подхватить изменения из других воркеров.
+    Пока идёт пересборка, запросы обслуживает прежняя версия индекса,
+    а рецепты, изменённые за это время, переносятся в новую.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = {}
+        self._ingredients = {}
+        self._recipe_ids = np.empty(0, dtype=np.int64)
+        self._sizes = np.empty(0, dtype=np.int64)
+        self._built_at = None
+        self._refreshing = False
+        self._building = 0
+        self._dirty = set()
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            self.rebuild()
+            return
+        if time.monotonic() - self._built_at <= settings.INGREDIENT_INDEX_TTL:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(
+            target=self._refresh, name='ingredient-index', daemon=True
+        ).start()
+
+    def _refresh(self):
+        try:
+            close_old_connections()
+            self.rebuild()
+        except Exception:
+            logger.exception('Не удалось пересобрать индекс ингредиентов')
+        finally:
+            connection.close()
+            with self._lock:
+                self._refreshing = False
+
+    def rebuild(self):
+        with self._lock:
+            self._building += 1
+        try:
+            self._build()
+        finally:
+            with self._lock:
+                self._building -= 1
+                dirty = set(self._dirty)
+                if not self._building:
+                    self._dirty = set()
+        for recipe_id in dirty:
+            self.update_recipe(recipe_id)
+
+    def _build(self):
+        pairs = IngredientRecipe.objects.values_list(
+            'ingredient_id', 'recipe_id'
+        ).order_by().distinct()
+        data = np.fromiter(
+            (value for pair in pairs.iterator() for value in pair),
+            dtype=np.int64
+        ).reshape(-1, 2)
+        ingredient_ids, recipe_ids = data[:, 0], data[:, 1]
+        order = np.lexsort((recipe_ids, ingredient_ids))
+        keys, starts = np.unique(ingredient_ids[order], return_index=True)
+        postings = dict(zip(
+            keys.tolist(), np.split(recipe_ids[order], starts[1:])
+        ))
+        order = np.lexsort((ingredient_ids, recipe_ids))
+        all_recipe_ids, starts, sizes = np.unique(
+            recipe_ids[order], return_index=True, return_counts=True
+        )
+        ingredients = dict(zip(
+            all_recipe_ids.tolist(),
+            np.split(ingredient_ids[order], starts[1:])
+        ))
+        with self._lock:
+            self._postings = postings
+            self._ingredients = ingredients
+            self._recipe_ids = all_recipe_ids
+            self._sizes = sizes
+            self._built_at = time.monotonic()
+
+    def _remove(self, recipe_id):
+        position = np.searchsorted(self._recipe_ids, recipe_id)
+        if (
+            position == len(self._recipe_ids)
+            or self._recipe_ids[position] != recipe_id
+        ):
+            return
+        self._recipe_ids = np.delete(self._recipe_ids, position)
+        self._sizes = np.delete(self._sizes, position)
+        for ingredient_id in self._ingredients.pop(recipe_id).tolist():
+            postings = self._postings[ingredient_id]
+            index = np.searchsorted(postings, recipe_id)
+            self._postings[ingredient_id] = np.delete(postings, index)
+
+    def schedule_update(self, recipe_id):
+        """Обновляет рецепт после коммита, один раз на транзакцию,
+        сколько бы его строк ни поменялось."""
+        if connection.in_atomic_block and any(
+            isinstance(callback, RecipeUpdate)
+            and callback.recipe_id == recipe_id
+            for _, callback in connection.run_on_commit
+        ):
+            return
+        transaction.on_commit(RecipeUpdate(self, recipe_id))
+
+    def _track(self, recipe_id):
+        """Запоминает рецепт для идущей пересборки; False, если индекса
+        ещё нет и обновлять нечего."""
+        if self._building:
+            self._dirty.add(recipe_id)
+        return self._built_at is not None
+
+    def update_recipe(self, recipe_id):
+        if self._built_at is None and not self._building:
+            return
+        ingredient_ids = sorted(set(IngredientRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient_id', flat=True)))
+        with self._lock:
+            if not self._track(recipe_id):
+                return
+            self._remove(recipe_id)
+            if not ingredient_ids:
+                return
+            position = np.searchsorted(self._recipe_ids, recipe_id)
+            self._recipe_ids = np.insert(
+                self._recipe_ids, position, recipe_id
+            )
+            self._sizes = np.insert(
+                self._sizes, position, len(ingredient_ids)
+            )
+            self._ingredients[recipe_id] = np.array(
+                ingredient_ids, dtype=np.int64
+            )
+            for ingredient_id in ingredient_ids:
+                postings = self._postings.get(
+                    ingredient_id, np.empty(0, dtype=np.int64)
+                )
+                self._postings[ingredient_id] = np.insert(
+                    postings, np.searchsorted(postings, recipe_id), recipe_id
+                )
+
+    def remove_recipe(self, recipe_id):
+        with self._lock:
+            if self._track(recipe_id):
+                self._remove(recipe_id)
+
+    def search(self, ingredient_ids, max_missing=None):
+        """Возвращает список (recipe_id, covered, missing), отсортированный
+        по числу покрытых ингредиентов и затем по числу недостающих."""
+        self._ensure_fresh()
+        with self._lock:
+            postings = [
+                self._postings[ingredient_id]
+                for ingredient_id in set(ingredient_ids)
+                if ingredient_id in self._postings
+            ]
+            if not postings:
+                return []
+            candidates, covered = np.unique(
+                np.concatenate(postings), return_counts=True
+            )
+            sizes = self._sizes[
+                np.searchsorted(self._recipe_ids, candidates)
+            ]
+        missing = sizes - covered
+        if max_missing is not None:
+            mask = missing <= max_missing
+            candidates = candidates[mask]
+            covered = covered[mask]
+            missing = missing[mask]
+        order = np.lexsort((candidates, missing, -covered))
+        return list(zip(
+            candidates[order].tolist(),
+            covered[order].tolist(),
+            missing[order].tolist()
+        ))
+
+
+class RecipeUpdate:
+    """Отложенное до коммита обновление рецепта в индексе."""
+
+    def __init__(self, index, recipe_id):
+        self.index = index
+        self.recipe_id = recipe_id
+
+    def __call__(self):
+        self.index.update_recipe(self.recipe_id)
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,130 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from recipes.models import (
+    IngredientRecipe,
+    ShoppingCart,
+    Ingredient,
+    FeedEntry,
+    Favorite,
+    Recipe
+)
+from users.models import Follow, User
+
+SEQ_SCAN = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+}
+SORT = {
+    'postgresql': re.compile(r'\bSort\b'),
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+}
+
+
+def representative_queries(user, author, recipe):
+    """Запросы из api/views.py и api/serializers.py на реальных id."""
+    page = slice(0, 6)
+    return {
+        'recipes.list': Recipe.objects.all()[page],
+        'recipes.filter_author': Recipe.objects.filter(author=author)[page],
+        'recipes.filter_favorited': Recipe.objects.filter(
+            favorites__user=user
+        )[page],
+        'recipes.filter_in_cart': Recipe.objects.filter(
+            shopping_list__user=user
+        )[page],
+        'recipes.cooking_time_range': Recipe.objects.filter(
+            cooking_time__gte=10, cooking_time__lte=30
+        ).order_by('cooking_time', '-pub_date')[page],
+        'recipes.order_name': Recipe.objects.order_by('name', 'id')[page],
+        'recipes.trending': Recipe.objects.filter(
+            popularity__gt=0
+        ).order_by('-popularity', '-id')[page],
+        'recipes.feed': FeedEntry.objects.filter(user=user)[page],
+        'recipe.ingredients': IngredientRecipe.objects.filter(
+            recipe=recipe
+        ),
+        'recipe.is_favorited': Favorite.objects.filter(
+            user=user, recipe=recipe
+        ),
+        'recipe.is_in_shopping_cart': ShoppingCart.objects.filter(
+            user=user, recipe=recipe
+        ),
+        'user.is_subscribed': Follow.objects.filter(
+            user=user, author=author
+        ),
+        'users.subscriptions': Follow.objects.filter(user=user)[page],
+        'follow.recipes': Recipe.objects.filter(author=author)[:3],
+        'follow.recipes_count': Recipe.objects.filter(
+            author=author
+        ).values('id'),
+        'shopping_cart.download': IngredientRecipe.objects.filter(
+            recipe__shopping_list__user=user
+        ).order_by('ingredient__name').values(
+            'ingredient__name',
+            'ingredient__measurement_unit'
+        ).annotate(amount=Sum('amount')),
+        'ingredients.search': Ingredient.objects.filter(
+            name__istartswith='ка'
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет EXPLAIN для горячих запросов API и отмечает '
+        'последовательные сканирования и сортировки без индекса. '
+        'Запускать на данных, близких по объёму к боевым: на маленьких '
+        'таблицах планировщик законно выбирает Seq Scan.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='EXPLAIN ANALYZE (только PostgreSQL).'
+        )
+        parser.add_argument(
+            '--verbose-plans',
+            action='store_true',
+            help='Печатать планы целиком.'
+        )
+        parser.add_argument(
+            '--strict',
+            action='store_true',
+            help='Завершиться с ошибкой, если найдены проблемы.'
+        )
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in SEQ_SCAN:
+            raise CommandError(f'СУБД {vendor} не поддерживается.')
+        user = User.objects.order_by('id').first()
+        recipe = Recipe.objects.order_by('id').first()
+        if user is None or recipe is None:
+            raise CommandError('Нужны хотя бы один пользователь и рецепт.')
+        explain_options = {}
+        if options['analyze'] and vendor == 'postgresql':
+            explain_options['analyze'] = True
+        issues = 0
+        for name, queryset in representative_queries(
+            user, recipe.author, recipe
+        ).items():
+            plan = queryset.explain(**explain_options)
+            problems = [
+                f'seq scan: {table}'
+                for table in SEQ_SCAN[vendor].findall(plan)
+            ]
+            if SORT[vendor].search(plan):
+                problems.append('sort without index')
+            issues += bool(problems)
+            status = '; '.join(problems) if problems else 'ok'
+            self.stdout.write(f'{name:32} {status}')
+            if options['verbose_plans'] or problems:
+                for line in plan.splitlines():
+                    self.stdout.write(f'    {line}')
+        if issues and options['strict']:
+            raise CommandError(f'Запросов с проблемами: {issues}.')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from recipes.catalog import build_catalog
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает снимок справочника тегов и ингредиентов.'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(f'Версия справочника: {build_catalog()}')
@@ -0,0 +1,151 @@
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from scipy import sparse
+
+from recipes.models import Favorite, Recipe
+from users.models import Follow, FollowSuggestion, User
+
+
+def load_pairs(queryset):
+    pairs = np.fromiter(
+        chain.from_iterable(queryset.iterator(chunk_size=10000)),
+        dtype=np.int64
+    )
+    return pairs.reshape(-1, 2)
+
+
+def lookup(ids, values):
+    """Позиции values в отсортированном ids и маска найденных."""
+    index = np.searchsorted(ids, values)
+    found = index < len(ids)
+    found[found] = ids[index[found]] == values[found]
+    return index, found
+
+
+def adjacency(rows, cols, row_ids, col_ids):
+    """Бинарная разреженная матрица связей между двумя наборами id.
+
+    Пары с id, которых нет в наборах, отбрасываются.
+    """
+    row_index, row_found = lookup(row_ids, rows)
+    col_index, col_found = lookup(col_ids, cols)
+    known = row_found & col_found
+    matrix = sparse.csr_matrix(
+        (
+            np.ones(known.sum(), dtype=np.float32),
+            (row_index[known], col_index[known])
+        ),
+        shape=(len(row_ids), len(col_ids))
+    )
+    matrix.data[:] = 1
+    return matrix
+
+
+def top_k(scores, k):
+    for row in range(scores.shape[0]):
+        start, end = scores.indptr[row], scores.indptr[row + 1]
+        data = scores.data[start:end]
+        if len(data) > k:
+            best = np.argpartition(-data, k - 1)[:k]
+        else:
+            best = np.arange(len(data))
+        for position in best[np.argsort(-data[best], kind='stable')]:
+            yield row, scores.indices[start + position], data[position]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации подписок по графу подписок '
+        'и общим избранным рецептам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top-k',
+            type=int,
+            default=settings.FOLLOW_SUGGESTIONS_TOP_K
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    @staticmethod
+    @transaction.atomic
+    def load_graph():
+        """Читает все таблицы графа из одного снимка БД."""
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET TRANSACTION ISOLATION LEVEL REPEATABLE READ'
+                )
+        user_ids = np.fromiter(
+            User.objects.order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+        follows = load_pairs(
+            Follow.objects.values_list('user_id', 'author_id')
+        )
+        favorites = load_pairs(
+            Favorite.objects.values_list('user_id', 'recipe_id')
+        )
+        recipes = load_pairs(
+            Recipe.objects.order_by('id').values_list('id', 'author_id')
+        )
+        return user_ids, follows, favorites, recipes
+
+    def handle(self, *args, **options):
+        user_ids, follows, favorites, recipes = self.load_graph()
+        recipe_ids = recipes[:, 0]
+
+        following = adjacency(
+            follows[:, 0], follows[:, 1], user_ids, user_ids
+        )
+        favorited = adjacency(
+            favorites[:, 0], favorites[:, 1], user_ids, recipe_ids
+        )
+        authored = adjacency(
+            recipes[:, 0], recipes[:, 1], recipe_ids, user_ids
+        )
+        favorite_authors = (favorited @ authored).tocsr()
+        favorite_authors.data[:] = 1
+        favorited_by = favorited.T.tocsr()
+        identity = sparse.identity(len(user_ids), format='csr')
+
+        follow_weight = settings.FOLLOW_SUGGESTIONS_FOLLOW_WEIGHT
+        favorite_weight = settings.FOLLOW_SUGGESTIONS_FAVORITE_WEIGHT
+        chunk_size = options['chunk_size']
+        saved = 0
+        with transaction.atomic():
+            FollowSuggestion.objects.all().delete()
+            for start in range(0, len(user_ids), chunk_size):
+                rows = slice(start, start + chunk_size)
+                second_degree = following[rows] @ following
+                co_favorites = favorited[rows] @ favorited_by
+                co_favorites = co_favorites - co_favorites.multiply(
+                    identity[rows]
+                )
+                scores = (
+                    follow_weight * second_degree
+                    + favorite_weight * (co_favorites @ favorite_authors)
+                ).tocsr()
+                excluded = following[rows] + identity[rows]
+                scores = scores - scores.multiply(excluded.sign())
+                scores.eliminate_zeros()
+                suggestions = [
+                    FollowSuggestion(
+                        user_id=int(user_ids[start + row]),
+                        author_id=int(user_ids[column]),
+                        score=float(score)
+                    )
+                    for row, column, score in top_k(scores, options['top_k'])
+                ]
+                FollowSuggestion.objects.bulk_create(
+                    suggestions, batch_size=1000
+                )
+                saved += len(suggestions)
+        self.stdout.write(
+            f'Рекомендаций сохранено: {saved} '
+            f'для {len(user_ids)} пользователей.'
+        )
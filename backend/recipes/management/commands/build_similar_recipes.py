@@ -0,0 +1,163 @@
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from recipes import similarity
+from recipes.models import (
+    IngredientRecipe,
+    RecipeSignature,
+    SimilarRecipe,
+    Recipe
+)
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает похожие рецепты по MinHash/LSH. '
+        'По умолчанию только для изменившихся рецептов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать все рецепты.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1
+        )
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started_at = timezone.now()
+        ingredients = defaultdict(set)
+        for recipe_id, ingredient_id in IngredientRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).iterator(chunk_size=10000):
+            ingredients[recipe_id].add(ingredient_id)
+        tags = defaultdict(set)
+        for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+            'recipe_id', 'tag_id'
+        ).iterator(chunk_size=10000):
+            tags[recipe_id].add(tag_id)
+
+        dirty = Recipe.objects.all()
+        if not options['full']:
+            dirty = dirty.filter(
+                Q(signature__isnull=True)
+                | Q(updated_at__gt=F('signature__computed_at'))
+            )
+        dirty_ids = list(dirty.values_list('id', flat=True))
+        if not dirty_ids:
+            self.stdout.write('Изменённых рецептов нет.')
+            return
+
+        chunk_size = options['chunk_size']
+        context = get_context('fork')
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], mp_context=context
+        ) as pool:
+            computed = []
+            for chunk in pool.map(
+                similarity.signatures_chunk,
+                chunked(
+                    [(pk, sorted(ingredients[pk])) for pk in dirty_ids],
+                    chunk_size
+                )
+            ):
+                computed.extend(chunk)
+        self.save_signatures(computed, started_at)
+
+        signatures = {
+            recipe_id: np.frombuffer(bytes(minhash), dtype=np.int64)
+            for recipe_id, minhash in RecipeSignature.objects.values_list(
+                'recipe_id', 'minhash'
+            ).iterator(chunk_size=10000)
+        }
+        buckets = similarity.build_buckets(signatures)
+        affected = set(dirty_ids)
+        for chunk in chunked(dirty_ids, 1000):
+            affected.update(SimilarRecipe.objects.filter(
+                similar_id__in=chunk
+            ).values_list('recipe_id', flat=True))
+        for recipe_id in dirty_ids:
+            affected.update(
+                similarity.candidates(recipe_id, signatures, buckets)
+            )
+        affected = sorted(affected)
+
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=context,
+            initializer=similarity.init_worker,
+            initargs=(
+                signatures,
+                buckets,
+                ingredients,
+                tags,
+                settings.SIMILAR_RECIPES_TOP_K,
+                settings.SIMILAR_RECIPES_TAG_BOOST,
+            )
+        ) as pool:
+            neighbours = []
+            for chunk in pool.map(
+                similarity.neighbours_chunk,
+                chunked(affected, chunk_size)
+            ):
+                neighbours.extend(chunk)
+        self.save_neighbours(affected, neighbours, chunk_size)
+        self.stdout.write(
+            f'Подписей пересчитано: {len(dirty_ids)}, '
+            f'списков похожих обновлено: {len(affected)}.'
+        )
+
+    @staticmethod
+    def save_signatures(computed, computed_at):
+        with transaction.atomic():
+            for chunk in chunked(computed, 1000):
+                RecipeSignature.objects.filter(
+                    recipe_id__in=[recipe_id for recipe_id, _ in chunk]
+                ).delete()
+            RecipeSignature.objects.bulk_create(
+                [
+                    RecipeSignature(
+                        recipe_id=recipe_id,
+                        minhash=minhash,
+                        computed_at=computed_at
+                    )
+                    for recipe_id, minhash in computed
+                ],
+                batch_size=1000
+            )
+
+    @staticmethod
+    def save_neighbours(affected, neighbours, chunk_size):
+        with transaction.atomic():
+            for chunk in chunked(affected, chunk_size):
+                SimilarRecipe.objects.filter(recipe_id__in=chunk).delete()
+            SimilarRecipe.objects.bulk_create(
+                [
+                    SimilarRecipe(
+                        recipe_id=recipe_id,
+                        similar_id=similar_id,
+                        score=score
+                    )
+                    for recipe_id, similar_id, score in neighbours
+                ],
+                batch_size=1000
+            )
@@ -0,0 +1,63 @@
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from recipes.models import PopularityDecay, Recipe
+
+
+class Command(BaseCommand):
+    help = (
+        'Применяет затухание популярности за время, прошедшее с прошлого '
+        'запуска, одним UPDATE.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=0.01,
+            help='Очки ниже порога обнуляются и больше не пересчитываются.'
+        )
+        parser.add_argument(
+            '--min-decay',
+            type=float,
+            default=0.01,
+            help='Меньшее затухание копится до следующего запуска.'
+        )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        now = timezone.now()
+        decay, _ = PopularityDecay.objects.select_for_update().get_or_create(
+            pk=1,
+            defaults={'decayed_at': now - timezone.timedelta(
+                hours=settings.POPULARITY_DECAY_INTERVAL_HOURS
+            )}
+        )
+        hours = max(0, (now - decay.decayed_at).total_seconds() / 3600)
+        factor = math.exp(
+            -math.log(2) * hours / settings.POPULARITY_HALF_LIFE_HOURS
+        )
+        if 1 - factor < options['min_decay']:
+            self.stdout.write(
+                f'Прошло {hours:.2f} ч, затухание отложено.'
+            )
+            return
+        updated = Recipe.objects.filter(popularity__gt=0).update(
+            popularity=Case(
+                When(
+                    popularity__lt=options['threshold'] / factor,
+                    then=Value(0.0)
+                ),
+                default=F('popularity') * factor
+            )
+        )
+        decay.decayed_at = now
+        decay.save(update_fields=('decayed_at',))
+        self.stdout.write(
+            f'Затухание за {hours:.2f} ч, обновлено рецептов: {updated}.'
+        )
@@ -0,0 +1,125 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from recipes.models import (
+    IngredientRecipe,
+    ShoppingCart,
+    Ingredient,
+    Favorite,
+    Recipe,
+    Tag
+)
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Выгружает рецепты и связанные данные в формате JSON Lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            nargs='?',
+            help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.chunk_size = options['chunk_size']
+        output = (
+            open(options['output'], 'w', encoding='utf-8')
+            if options['output'] else sys.stdout
+        )
+        try:
+            self.export(output)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+    def write(self, output, record):
+        output.write(json.dumps(record, ensure_ascii=False))
+        output.write('\n')
+
+    def export(self, output):
+        for name, color, slug in Tag.objects.values_list(
+            'name', 'color', 'slug'
+        ).iterator(chunk_size=self.chunk_size):
+            self.write(output, {
+                'type': 'tag', 'name': name, 'color': color, 'slug': slug
+            })
+        for name, unit in Ingredient.objects.values_list(
+            'name', 'measurement_unit'
+        ).order_by().iterator(chunk_size=self.chunk_size):
+            self.write(output, {
+                'type': 'ingredient', 'name': name, 'measurement_unit': unit
+            })
+        for values in User.objects.values_list(
+            'email', 'username', 'first_name', 'last_name', 'password'
+        ).order_by().iterator(chunk_size=self.chunk_size):
+            self.write(output, dict(zip(
+                ('email', 'username', 'first_name', 'last_name', 'password'),
+                values
+            ), type='user'))
+        self.export_recipes(output)
+        for user, author in Follow.objects.values_list(
+            'user__email', 'author__email'
+        ).order_by().iterator(chunk_size=self.chunk_size):
+            self.write(output, {
+                'type': 'follow', 'user': user, 'author': author
+            })
+        for record_type, model in (
+            ('favorite', Favorite),
+            ('cart', ShoppingCart)
+        ):
+            for user, recipe in model.objects.values_list(
+                'user__email', 'recipe_id'
+            ).order_by().iterator(chunk_size=self.chunk_size):
+                self.write(output, {
+                    'type': record_type, 'user': user, 'recipe': recipe
+                })
+
+    def export_recipes(self, output):
+        last_id = 0
+        while True:
+            recipes = list(Recipe.objects.filter(id__gt=last_id).order_by(
+                'id'
+            ).values(
+                'id', 'author__email', 'name', 'image', 'text',
+                'cooking_time', 'pub_date', 'popularity'
+            )[:self.chunk_size])
+            if not recipes:
+                return
+            ids = [recipe['id'] for recipe in recipes]
+            ingredients = {}
+            for recipe_id, name, unit, amount in (
+                IngredientRecipe.objects.filter(recipe_id__in=ids).values_list(
+                    'recipe_id',
+                    'ingredient__name',
+                    'ingredient__measurement_unit',
+                    'amount'
+                ).order_by()
+            ):
+                ingredients.setdefault(recipe_id, []).append(
+                    [name, unit, amount]
+                )
+            tags = {}
+            for recipe_id, slug in Recipe.tags.through.objects.filter(
+                recipe_id__in=ids
+            ).values_list('recipe_id', 'tag__slug'):
+                tags.setdefault(recipe_id, []).append(slug)
+            for recipe in recipes:
+                self.write(output, {
+                    'type': 'recipe',
+                    'key': recipe['id'],
+                    'author': recipe['author__email'],
+                    'name': recipe['name'],
+                    'image': recipe['image'],
+                    'text': recipe['text'],
+                    'cooking_time': recipe['cooking_time'],
+                    'pub_date': recipe['pub_date'].isoformat(),
+                    'popularity': recipe['popularity'],
+                    'tags': tags.get(recipe['id'], []),
+                    'ingredients': ingredients.get(recipe['id'], []),
+                })
+            last_id = ids[-1]
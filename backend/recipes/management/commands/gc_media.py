@@ -0,0 +1,147 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from recipes.media_cleanup import delete_unreferenced
+from recipes.models import MediaFile, Recipe
+
+
+def walk(root):
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит в MEDIA_ROOT изображения, на которые не ссылается '
+        'ни один рецепт, и удаляет их (с --delete) или выводит список.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default='recipes',
+            help='Подкаталог MEDIA_ROOT для проверки.'
+        )
+        parser.add_argument('--delete', action='store_true')
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=3600,
+            help='Не трогать файлы моложе стольких секунд.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Пересчитать счётчики ссылок MediaFile по рецептам.'
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount(options['batch_size'])
+        root = os.path.join(settings.MEDIA_ROOT, options['path'])
+        if not os.path.isdir(root):
+            self.stdout.write(f'Каталог {root} не найден.')
+            return
+        self.delete = options['delete']
+        self.checked = self.orphans = self.freed = 0
+        newest = time.time() - options['min_age']
+        batch = {}
+        for entry in walk(root):
+            if entry.stat().st_mtime > newest:
+                continue
+            name = os.path.relpath(
+                entry.path, settings.MEDIA_ROOT
+            ).replace(os.sep, '/')
+            batch[name] = entry
+            if len(batch) >= options['batch_size']:
+                self.process(batch)
+                batch = {}
+        if batch:
+            self.process(batch)
+        action = 'Удалено' if self.delete else 'Найдено'
+        self.stdout.write(
+            f'Проверено файлов: {self.checked}. {action} сирот: '
+            f'{self.orphans} ({self.freed} байт).'
+        )
+
+    def recount(self, batch_size):
+        """Пересчитывает счётчики пачками, каждая в своей короткой
+        транзакции под блокировкой своих строк MediaFile."""
+        recounted = last_pk = 0
+        while True:
+            with transaction.atomic():
+                files = list(MediaFile.objects.select_for_update().filter(
+                    pk__gt=last_pk
+                ).order_by('pk')[:batch_size])
+                if not files:
+                    break
+                counts = self.count_references(
+                    [media_file.name for media_file in files]
+                )
+                for media_file in files:
+                    media_file.refcount = counts.get(media_file.name, 0)
+                MediaFile.objects.bulk_update(files, ('refcount',))
+            recounted += len(files)
+            last_pk = files[-1].pk
+        last_name = ''
+        while True:
+            names = list(Recipe.objects.filter(
+                image__gt=last_name
+            ).order_by('image').values_list('image', flat=True).distinct()[
+                :batch_size
+            ])
+            if not names:
+                break
+            counts = self.count_references(names)
+            MediaFile.objects.bulk_create(
+                [
+                    MediaFile(name=name, refcount=total)
+                    for name, total in counts.items()
+                ],
+                ignore_conflicts=True
+            )
+            last_name = names[-1]
+        self.stdout.write(f'Счётчики ссылок пересчитаны: {recounted}.')
+
+    @staticmethod
+    def count_references(names):
+        return dict(Recipe.objects.filter(image__in=names).values(
+            'image'
+        ).annotate(total=Count('id')).values_list(
+            'image', 'total'
+        ).order_by())
+
+    def process(self, batch):
+        files = dict(MediaFile.objects.filter(
+            name__in=list(batch)
+        ).values_list('name', 'refcount'))
+        referenced = {name for name, refcount in files.items() if refcount}
+        # Файлы без строки MediaFile (до подсчёта ссылок) сверяются
+        # с рецептами по индексу recipe_image_idx.
+        referenced.update(Recipe.objects.filter(
+            image__in=[name for name in batch if name not in files]
+        ).values_list('image', flat=True))
+        self.checked += len(batch)
+        for name, entry in batch.items():
+            if name in referenced:
+                continue
+            size = entry.stat().st_size
+            if not self.delete:
+                self.orphans += 1
+                self.freed += size
+                self.stdout.write(name)
+            elif delete_unreferenced(name):
+                self.orphans += 1
+                self.freed += size
@@ -2,6 +2,7 @@ import csv
 
 from django.core.management.base import BaseCommand
 
+from recipes.catalog import build_catalog
 from recipes.models import Ingredient
 
 
@@ -14,6 +15,7 @@ class Command(BaseCommand):
             return
         path_csv = "data/ingredients.csv"
         self._import_ingredients(path_csv)
+        build_catalog()
         self.stdout.write("Данные успешно загружены.")
 
     @staticmethod
@@ -0,0 +1,260 @@
+import json
+import os
+import sys
+from collections import Counter
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from recipes import feed, media_cleanup
+from recipes.catalog import build_catalog
+from recipes.models import (
+    IngredientRecipe,
+    ShoppingCart,
+    Ingredient,
+    Favorite,
+    Recipe,
+    Tag
+)
+from recipes.storage import recipe_image_storage
+from users.models import Follow, User
+
+
+class Command(BaseCommand):
+    help = 'Загружает выгрузку export_recipes потоково, пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input',
+            nargs='?',
+            help='Файл выгрузки, по умолчанию stdin.'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--media-from',
+            help='MEDIA_ROOT исходного окружения: изображения будут '
+                 'скопированы в хранилище (одинаковые по содержимому '
+                 'хранятся одним файлом).'
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        self.media_from = options['media_from']
+        self.recipe_ids = {}
+        self.tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+        self.ingredient_ids = {}
+        self.counts = {}
+        source = (
+            open(options['input'], encoding='utf-8')
+            if options['input'] else sys.stdin
+        )
+        try:
+            self.load(source)
+        finally:
+            if source is not sys.stdin:
+                source.close()
+        if 'tag' in self.counts or 'ingredient' in self.counts:
+            build_catalog()
+        self.stdout.write(', '.join(
+            f'{record_type}: {count}'
+            for record_type, count in self.counts.items()
+        ))
+
+    def load(self, source):
+        batch = []
+        batch_type = None
+        for line in source:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if batch and (
+                record['type'] != batch_type
+                or len(batch) >= self.batch_size
+            ):
+                self.flush(batch_type, batch)
+                batch = []
+            batch_type = record['type']
+            batch.append(record)
+        if batch:
+            self.flush(batch_type, batch)
+
+    def flush(self, record_type, batch):
+        loader = getattr(self, f'load_{record_type}', None)
+        if loader is None:
+            raise CommandError(f'Неизвестный тип записи: {record_type}')
+        with transaction.atomic():
+            loader(batch)
+        self.counts[record_type] = (
+            self.counts.get(record_type, 0) + len(batch)
+        )
+
+    def load_tag(self, batch):
+        Tag.objects.bulk_create(
+            [
+                Tag(
+                    name=record['name'],
+                    color=record['color'],
+                    slug=record['slug']
+                )
+                for record in batch
+            ],
+            ignore_conflicts=True
+        )
+        self.tag_ids = dict(Tag.objects.values_list('slug', 'id'))
+
+    def load_ingredient(self, batch):
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(
+                    name=record['name'],
+                    measurement_unit=record['measurement_unit']
+                )
+                for record in batch
+            ],
+            ignore_conflicts=True
+        )
+
+    def load_user(self, batch):
+        User.objects.bulk_create(
+            [
+                User(
+                    email=record['email'],
+                    username=record['username'],
+                    first_name=record['first_name'],
+                    last_name=record['last_name'],
+                    password=record['password']
+                )
+                for record in batch
+            ],
+            ignore_conflicts=True
+        )
+
+    def user_ids(self, emails):
+        return dict(
+            User.objects.filter(email__in=set(emails)).values_list(
+                'email', 'id'
+            )
+        )
+
+    def ingredient_id(self, name, unit):
+        if not self.ingredient_ids:
+            self.ingredient_ids = {
+                (ingredient_name, ingredient_unit): pk
+                for pk, ingredient_name, ingredient_unit
+                in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).iterator()
+            }
+        return self.ingredient_ids.get((name, unit))
+
+    def copy_image(self, name):
+        if not self.media_from or not name:
+            return name
+        path = os.path.join(self.media_from, name)
+        if not os.path.exists(path):
+            return name
+        target = Recipe._meta.get_field('image').generate_filename(
+            None, os.path.basename(name)
+        )
+        with open(path, 'rb') as source:
+            return recipe_image_storage.save(target, File(source))
+
+    def load_recipe(self, batch):
+        authors = self.user_ids(record['author'] for record in batch)
+        batch = [record for record in batch if record['author'] in authors]
+        recipes = [
+            Recipe(
+                author_id=authors[record['author']],
+                name=record['name'],
+                image=self.copy_image(record['image']),
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                popularity=record.get('popularity', 0)
+            )
+            for record in batch
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(recipes)
+            # bulk_create не шлёт post_save, ссылки учитываются здесь.
+            images = Counter(recipe.image.name for recipe in recipes)
+            for name, count in images.items():
+                media_cleanup.acquire(name, count)
+        else:
+            # Без RETURNING не узнать id новых рецептов.
+            for recipe in recipes:
+                recipe.save()
+        for recipe, record in zip(recipes, batch):
+            recipe.pub_date = parse_datetime(record['pub_date'])
+            self.recipe_ids[record['key']] = recipe.id
+        Recipe.objects.bulk_update(recipes, ('pub_date',))
+        IngredientRecipe.objects.bulk_create([
+            IngredientRecipe(
+                recipe_id=recipe.id,
+                ingredient_id=self.ingredient_id(name, unit),
+                amount=amount
+            )
+            for recipe, record in zip(recipes, batch)
+            for name, unit, amount in record['ingredients']
+            if self.ingredient_id(name, unit)
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(
+                recipe_id=recipe.id,
+                tag_id=self.tag_ids[slug]
+            )
+            for recipe, record in zip(recipes, batch)
+            for slug in record['tags']
+            if slug in self.tag_ids
+        ])
+
+    def load_follow(self, batch):
+        users = self.user_ids(
+            email for record in batch
+            for email in (record['user'], record['author'])
+        )
+        pairs = {
+            (users[record['user']], users[record['author']])
+            for record in batch
+            if record['user'] in users and record['author'] in users
+        }
+        pairs -= set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs}
+        ).values_list('user_id', 'author_id'))
+        Follow.objects.bulk_create(
+            [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs
+            ],
+            ignore_conflicts=True
+        )
+        # bulk_create не шлёт post_save: ленты и счётчики подписчиков
+        # обновляются здесь.
+        feed.backfill_follows(pairs)
+        for author_id, count in Counter(
+            author_id for _, author_id in pairs
+        ).items():
+            feed.add_followers(author_id, count)
+
+    def load_user_recipe(self, model, batch):
+        users = self.user_ids(record['user'] for record in batch)
+        model.objects.bulk_create(
+            [
+                model(
+                    user_id=users[record['user']],
+                    recipe_id=self.recipe_ids[record['recipe']]
+                )
+                for record in batch
+                if record['user'] in users
+                and record['recipe'] in self.recipe_ids
+            ],
+            ignore_conflicts=True
+        )
+
+    def load_favorite(self, batch):
+        self.load_user_recipe(Favorite, batch)
+
+    def load_cart(self, batch):
+        self.load_user_recipe(ShoppingCart, batch)
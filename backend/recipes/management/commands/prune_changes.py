@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import Change
+
+
+class Command(BaseCommand):
+    help = 'Удаляет старые записи журнала изменений пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.CHANGES_RETENTION_DAYS
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        border = timezone.now() - timezone.timedelta(days=options['days'])
+        last = Change.objects.filter(
+            created_at__lt=border, position__isnull=False
+        ).order_by('-position').values_list('position', flat=True).first()
+        deleted = 0
+        if last is not None:
+            start = Change.objects.filter(
+                position__isnull=False
+            ).order_by('position').values_list('position', flat=True).first()
+            while start <= last:
+                end = min(start + options['batch_size'], last + 1)
+                deleted += Change.objects.filter(
+                    position__gte=start, position__lt=end
+                ).delete()[0]
+                start = end
+        # Записи, которые так и не получили номер, удаляются по id.
+        while True:
+            ids = list(Change.objects.filter(
+                position__isnull=True, created_at__lt=border
+            ).order_by('id').values_list('id', flat=True)[
+                :options['batch_size']
+            ])
+            if not ids:
+                break
+            deleted += Change.objects.filter(id__in=ids).delete()[0]
+        self.stdout.write(f'Удалено записей: {deleted}.')
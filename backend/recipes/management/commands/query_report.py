@@ -0,0 +1,64 @@
+import glob
+import json
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает самые дорогие запросы по данным QueryProfilingMiddleware '
+        'из всех процессов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=20)
+        parser.add_argument(
+            '--by',
+            choices=('total', 'count', 'max'),
+            default='total'
+        )
+        parser.add_argument(
+            '--group',
+            choices=('site', 'view', 'sql'),
+            default='site',
+            help='Группировать по месту вызова, view или самому запросу.'
+        )
+        parser.add_argument(
+            '--reset',
+            action='store_true',
+            help='Удалить накопленные файлы после отчёта.'
+        )
+
+    def handle(self, *args, **options):
+        paths = glob.glob(
+            os.path.join(settings.QUERY_PROFILING_DIR, 'queries.*.json')
+        )
+        totals = defaultdict(lambda: [0, 0.0, 0.0, None])
+        for path in paths:
+            with open(path) as source:
+                for sql, view, site, count, total, peak in json.load(source):
+                    key = {'site': site, 'view': view, 'sql': sql}[
+                        options['group']
+                    ]
+                    row = totals[key]
+                    row[0] += count
+                    row[1] += total
+                    row[2] = max(row[2], peak)
+                    row[3] = row[3] or sql
+        column = {'count': 0, 'total': 1, 'max': 2}[options['by']]
+        rows = sorted(
+            totals.items(), key=lambda item: -item[1][column]
+        )[:options['top']]
+        self.stdout.write(
+            f'{"количество":>10} {"всего,мс":>10} {"макс,мс":>9}  ключ'
+        )
+        for key, (count, total, peak, sql) in rows:
+            self.stdout.write(f'{count:10} {total:10.1f} {peak:9.1f}  {key}')
+            if options['group'] != 'sql':
+                self.stdout.write(f'{"":32}{sql[:160]}')
+        if options['reset']:
+            for path in paths:
+                os.remove(path)
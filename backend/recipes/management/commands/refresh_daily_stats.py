@@ -0,0 +1,156 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes import outbox
+from recipes.models import (
+    DailyIngredientStats,
+    DailyActiveUser,
+    DailyRecipeStats,
+    IngredientRecipe,
+    StatsWatermark,
+    DailyStats,
+    Change,
+    Recipe
+)
+
+WATERMARK = 'daily_stats'
+
+
+def merge(model, keys, rows):
+    """Прибавляет счётчики из rows к строкам сводной таблицы.
+
+    rows — словарь {(день, id, ...): {поле: прирост}}, порядок ключей
+    задаёт keys.
+    """
+    if not rows:
+        return
+    lookups = {
+        f'{key}__in': {values[position] for values in rows}
+        for position, key in enumerate(keys)
+    }
+    existing = {
+        tuple(getattr(obj, key) for key in keys): obj
+        for obj in model.objects.filter(**lookups)
+    }
+    fields = {field for deltas in rows.values() for field in deltas}
+    to_update, to_create = [], []
+    for values, deltas in rows.items():
+        obj = existing.get(values)
+        if obj is None:
+            to_create.append(model(**dict(zip(keys, values)), **deltas))
+            continue
+        for field, delta in deltas.items():
+            setattr(obj, field, getattr(obj, field) + delta)
+        to_update.append(obj)
+    if to_update:
+        model.objects.bulk_update(
+            to_update, sorted(fields), batch_size=1000
+        )
+    model.objects.bulk_create(to_create, batch_size=1000)
+
+
+class Command(BaseCommand):
+    help = (
+        'Дополняет дневные сводные таблицы по журналу изменений, '
+        'начиная с сохранённой отметки. Данные до появления журнала '
+        'не восстанавливаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.DAILY_STATS_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        processed = 0
+        while True:
+            outbox.sequence()
+            count = self.refresh_batch(options['batch_size'])
+            if not count:
+                break
+            processed += count
+        self.stdout.write(f'Изменений обработано: {processed}.')
+
+    @transaction.atomic
+    def refresh_batch(self, batch_size):
+        watermark, _ = StatsWatermark.objects.select_for_update(
+        ).get_or_create(name=WATERMARK)
+        changes = list(Change.objects.filter(
+            position__gt=watermark.position
+        ).order_by('position').values_list(
+            'position', 'entity', 'action', 'object_id', 'user_id',
+            'created_at'
+        )[:batch_size])
+        if not changes:
+            return 0
+
+        daily = defaultdict(Counter)
+        recipes = defaultdict(Counter)
+        carted = []
+        active = set()
+        for _, entity, action, object_id, user_id, created_at in changes:
+            day = timezone.localdate(created_at)
+            if user_id is not None:
+                active.add((day, user_id))
+            if action != Change.CREATE:
+                continue
+            if entity == Change.RECIPE:
+                daily[(day,)]['recipes_created'] += 1
+            elif entity == Change.FAVORITE:
+                daily[(day,)]['favorites_added'] += 1
+                recipes[(day, object_id)]['favorites'] += 1
+            elif entity == Change.SHOPPING_CART:
+                daily[(day,)]['shopping_carts_added'] += 1
+                recipes[(day, object_id)]['shopping_carts'] += 1
+                carted.append((day, object_id))
+
+        ingredients_of = defaultdict(list)
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in={recipe_id for _, recipe_id in carted}
+        ).values_list('recipe_id', 'ingredient_id'):
+            ingredients_of[recipe_id].append(ingredient_id)
+        ingredients = defaultdict(Counter)
+        for day, recipe_id in carted:
+            for ingredient_id in ingredients_of[recipe_id]:
+                ingredients[(day, ingredient_id)]['shopping_carts'] += 1
+        existing_recipes = set(Recipe.objects.filter(
+            id__in={recipe_id for _, recipe_id in recipes}
+        ).values_list('id', flat=True))
+        recipes = {
+            key: deltas for key, deltas in recipes.items()
+            if key[1] in existing_recipes
+        }
+
+        # Активный за день пользователь учитывается один раз: строка
+        # DailyActiveUser хранится, пока в журнал может прийти запись
+        # за этот день, поэтому счётчик только увеличивается на новых.
+        border = timezone.localdate() - timezone.timedelta(
+            days=settings.CHANGES_RETENTION_DAYS
+        )
+        active = {(day, user) for day, user in active if day >= border}
+        known = set(DailyActiveUser.objects.filter(
+            date__in={day for day, _ in active},
+            user_id__in={user for _, user in active}
+        ).values_list('date', 'user_id'))
+        new_active = active - known
+        for day, _ in new_active:
+            daily[(day,)]['active_users'] += 1
+        DailyActiveUser.objects.bulk_create(
+            [DailyActiveUser(date=day, user_id=user)
+             for day, user in new_active],
+            batch_size=1000
+        )
+
+        merge(DailyStats, ('date',), daily)
+        merge(DailyRecipeStats, ('date', 'recipe_id'), recipes)
+        merge(DailyIngredientStats, ('date', 'ingredient_id'), ingredients)
+        DailyActiveUser.objects.filter(date__lt=border).delete()
+        watermark.position = changes[-1][0]
+        watermark.save(update_fields=('position', 'updated_at'))
+        return len(changes)
@@ -0,0 +1,219 @@
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import Resolver404, resolve
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+# Формат combined, который nginx пишет по умолчанию (infra/nginx.conf
+# не задаёт своего log_format).
+LOG_LINE = re.compile(
+    r'(?P<addr>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] '
+    r'"(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3}) '
+)
+TIME_FORMAT = '%d/%b/%Y:%H:%M:%S %z'
+
+
+def parse_log(path, methods):
+    with open(path, encoding='utf-8', errors='replace') as source:
+        for line in source:
+            match = LOG_LINE.match(line)
+            if not match or match['method'] not in methods:
+                continue
+            if not urlsplit(match['path']).path.startswith('/api/'):
+                continue
+            yield (
+                datetime.strptime(match['time'], TIME_FORMAT).timestamp(),
+                match['addr'],
+                match['method'],
+                match['path'],
+            )
+
+
+def route_of(path):
+    try:
+        match = resolve(urlsplit(path).path)
+    except Resolver404:
+        return 'unresolved'
+    return match.view_name or match.route
+
+
+def percentile(values, fraction):
+    index = min(len(values) - 1, int(len(values) * fraction))
+    return values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Воспроизводит запросы к /api/ из access-лога nginx и печатает '
+        'пропускную способность, перцентили задержки и доли ответов '
+        '4xx и 5xx по маршрутам.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('log', help='Файл access-лога nginx.')
+        parser.add_argument(
+            '--url',
+            help='Базовый URL (например, http://127.0.0.1:8000). '
+                 'Без него запросы идут в приложение внутри процесса.'
+        )
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--speedup',
+            type=float,
+            default=1.0,
+            help='Во сколько раз ускорить воспроизведение; 0 - без пауз.'
+        )
+        parser.add_argument(
+            '--methods',
+            default='GET,HEAD',
+            help='Какие методы воспроизводить.'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10,
+            help='Сколько тестовых пользователей подставлять вместо '
+                 'реальных клиентов.'
+        )
+        parser.add_argument(
+            '--anonymous',
+            action='store_true',
+            help='Отправлять запросы без токенов.'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('Нужен хотя бы один поток.')
+        self.base_url = (options['url'] or '').rstrip('/')
+        self.tokens = [] if options['anonymous'] else self.test_tokens(
+            options['users']
+        )
+        self.clients = threading.local()
+        self.stats = defaultdict(
+            lambda: {'latencies': [], 'client_errors': 0, 'errors': 0}
+        )
+        self.stats_lock = threading.Lock()
+        self.token_by_addr = {}
+        methods = set(options['methods'].upper().split(','))
+        pending = threading.BoundedSemaphore(options['workers'] * 4)
+        started = time.monotonic()
+        first_ts = None
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for timestamp, addr, method, path in parse_log(
+                options['log'], methods
+            ):
+                if first_ts is None:
+                    first_ts = timestamp
+                if options['speedup'] > 0:
+                    delay = (
+                        (timestamp - first_ts) / options['speedup']
+                        - (time.monotonic() - started)
+                    )
+                    if delay > 0:
+                        time.sleep(delay)
+                pending.acquire()
+                future = pool.submit(
+                    self.replay, method, path, self.token_for(addr)
+                )
+                future.add_done_callback(lambda _: pending.release())
+        self.report(time.monotonic() - started)
+
+    def test_tokens(self, count):
+        tokens = []
+        for number in range(count):
+            user, _ = User.objects.get_or_create(
+                email=f'replay{number}@example.com',
+                defaults={
+                    'username': f'replay{number}',
+                    'first_name': 'Replay',
+                    'last_name': str(number),
+                }
+            )
+            tokens.append(Token.objects.get_or_create(user=user)[0].key)
+        return tokens
+
+    def token_for(self, addr):
+        if not self.tokens:
+            return None
+        if addr not in self.token_by_addr:
+            self.token_by_addr[addr] = self.tokens[
+                len(self.token_by_addr) % len(self.tokens)
+            ]
+        return self.token_by_addr[addr]
+
+    def send(self, method, path, token):
+        headers = {'Authorization': f'Token {token}'} if token else {}
+        if self.base_url:
+            request = Request(
+                self.base_url + path, method=method, headers=headers
+            )
+            try:
+                with urlopen(request, timeout=30) as response:
+                    response.read()
+                    return response.status
+            except HTTPError as error:
+                return error.code
+            except URLError:
+                return 599
+        client = getattr(self.clients, 'client', None)
+        if client is None:
+            client = self.clients.client = Client()
+        extra = {'HTTP_AUTHORIZATION': headers['Authorization']} if (
+            token
+        ) else {}
+        return client.generic(method, path, **extra).status_code
+
+    def replay(self, method, path, token):
+        route = f'{method} {route_of(path)}'
+        started = time.perf_counter()
+        try:
+            status = self.send(method, path, token)
+        except Exception:
+            status = 599
+        elapsed = time.perf_counter() - started
+        with self.stats_lock:
+            stats = self.stats[route]
+            stats['latencies'].append(elapsed)
+            if status >= 500:
+                stats['errors'] += 1
+            elif status >= 400:
+                stats['client_errors'] += 1
+
+    def report(self, duration):
+        total = sum(len(stats['latencies']) for stats in self.stats.values())
+        client_errors = sum(
+            stats['client_errors'] for stats in self.stats.values()
+        )
+        errors = sum(stats['errors'] for stats in self.stats.values())
+        self.stdout.write(
+            f'Запросов: {total}, время: {duration:.1f} с, '
+            f'пропускная способность: {total / max(duration, 1e-9):.1f} rps, '
+            f'ответов 4xx: {client_errors}, 5xx: {errors}'
+        )
+        self.stdout.write(
+            f'{"маршрут":50} {"n":>7} {"p50,мс":>8} {"p95,мс":>8} '
+            f'{"p99,мс":>8} {"4xx":>7} {"5xx":>7}'
+        )
+        for route, stats in sorted(
+            self.stats.items(), key=lambda item: -len(item[1]['latencies'])
+        ):
+            latencies = sorted(stats['latencies'])
+            self.stdout.write(
+                f'{route[:50]:50} {len(latencies):7} '
+                f'{percentile(latencies, 0.5) * 1000:8.1f} '
+                f'{percentile(latencies, 0.95) * 1000:8.1f} '
+                f'{percentile(latencies, 0.99) * 1000:8.1f} '
+                f'{stats["client_errors"] / len(latencies):7.1%} '
+                f'{stats["errors"] / len(latencies):7.1%}'
+            )
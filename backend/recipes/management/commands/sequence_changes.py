@@ -0,0 +1,50 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from recipes import outbox
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Нумерует новые записи журнала изменений. Работает постоянно, '
+        'проверяя журнал раз в --interval секунд; с --once выходит '
+        'после первого прохода.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=settings.CHANGES_SEQUENCE_INTERVAL
+        )
+        parser.add_argument('--once', action='store_true')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                numbered = self.sequence_all()
+            except Exception:
+                if options['once']:
+                    raise
+                logger.exception('Не удалось пронумеровать журнал')
+                connection.close()
+            else:
+                if options['once']:
+                    self.stdout.write(f'Пронумеровано записей: {numbered}.')
+                    return
+            time.sleep(options['interval'])
+
+    @staticmethod
+    def sequence_all():
+        numbered = 0
+        while True:
+            count = outbox.sequence()
+            if not count:
+                return numbered
+            numbered += count
@@ -0,0 +1,100 @@
+import logging
+import queue
+import threading
+
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from recipes.models import MediaFile, Recipe
+from recipes.storage import recipe_image_storage
+
+logger = logging.getLogger(__name__)
+
+_queue = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _run():
+    while True:
+        name = _queue.get()
+        try:
+            close_old_connections()
+            delete_unreferenced(name)
+        except Exception:
+            logger.exception('Не удалось удалить файл %s', name)
+        finally:
+            _queue.task_done()
+
+
+@transaction.atomic
+def delete_unreferenced(name):
+    """Удаляет файл, если на него не ссылается ни один рецепт.
+
+    Проверка и удаление идут под блокировкой строки MediaFile, которую
+    берёт и хранилище при сохранении файла, так что файл, только что
+    переиспользованный незакоммиченной транзакцией, не удаляется.
+    Для файлов без строки (до подсчёта ссылок) она создаётся по числу
+    рецептов.
+    """
+    media_file, created = MediaFile.objects.select_for_update(
+    ).get_or_create(name=name)
+    if created:
+        media_file.refcount = Recipe.objects.filter(image=name).count()
+        media_file.save(update_fields=('refcount',))
+    if media_file.refcount > 0:
+        return False
+    media_file.delete()
+    recipe_image_storage.delete(name)
+    return True
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(
+                target=_run, name='media-cleanup', daemon=True
+            )
+            _worker.start()
+
+
+def schedule_delete(name):
+    """Ставит файл в очередь на удаление после коммита транзакции.
+
+    Удаление выполняется фоновым потоком, и только если на файл
+    больше не ссылается ни один рецепт.
+    """
+    if not name:
+        return
+
+    def enqueue():
+        _ensure_worker()
+        _queue.put(name)
+
+    transaction.on_commit(enqueue)
+
+
+def acquire(name, count=1):
+    """Учитывает новые ссылки рецептов на файл."""
+    if not name:
+        return
+    MediaFile.objects.get_or_create(name=name)
+    MediaFile.objects.filter(name=name).update(
+        refcount=F('refcount') + count
+    )
+
+
+def release(name):
+    """Снимает ссылку на файл; файл без ссылок удаляется после
+    коммита."""
+    if not name:
+        return
+    MediaFile.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1
+    )
+    schedule_delete(name)
+
+
+def wait():
+    _queue.join()
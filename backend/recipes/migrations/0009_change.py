@@ -0,0 +1,38 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('recipe', 'Рецепт'), ('recipe_ingredients', 'Ингредиенты рецепта'), ('recipe_tags', 'Теги рецепта'), ('favorite', 'Избранное'), ('shopping_cart', 'Корзина'), ('follow', 'Подписка')], max_length=32, verbose_name='Сущность')),
+                ('action', models.CharField(choices=[('create', 'Создание'), ('update', 'Изменение'), ('delete', 'Удаление')], max_length=8, verbose_name='Действие')),
+                ('object_id', models.BigIntegerField(verbose_name='Объект')),
+                ('user_id', models.BigIntegerField(null=True, verbose_name='Пользователь')),
+                ('public', models.BooleanField(default=False, verbose_name='Видно всем')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user_id', 'id'], name='change_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['public', 'id'], name='change_public_id_idx'),
+        ),
+    ]
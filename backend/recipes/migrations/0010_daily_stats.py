@@ -0,0 +1,94 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_change'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActiveUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('user_id', models.BigIntegerField(verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Активный пользователь за день',
+                'verbose_name_plural': 'Активные пользователи по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='День')),
+                ('recipes_created', models.PositiveIntegerField(default=0, verbose_name='Новых рецептов')),
+                ('favorites_added', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('shopping_carts_added', models.PositiveIntegerField(default=0, verbose_name='Добавлений в корзину')),
+                ('active_users', models.PositiveIntegerField(default=0, verbose_name='Активных пользователей')),
+            ],
+            options={
+                'verbose_name': 'Статистика за день',
+                'verbose_name_plural': 'Статистика по дням',
+                'ordering': ('-date',),
+            },
+        ),
+        migrations.CreateModel(
+            name='StatsWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True, verbose_name='Название')),
+                ('position', models.BigIntegerField(default=0, verbose_name='Последнее обработанное изменение')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Отметка агрегации',
+                'verbose_name_plural': 'Отметки агрегации',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyRecipeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('favorites', models.PositiveIntegerField(default=0, verbose_name='Добавлений в избранное')),
+                ('shopping_carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в корзину')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.recipe', verbose_name='Рецепт')),
+            ],
+            options={
+                'verbose_name': 'Статистика рецепта за день',
+                'verbose_name_plural': 'Статистика рецептов по дням',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyIngredientStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='День')),
+                ('shopping_carts', models.PositiveIntegerField(default=0, verbose_name='Добавлений в корзину')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='recipes.ingredient', verbose_name='Ингредиент')),
+            ],
+            options={
+                'verbose_name': 'Статистика ингредиента за день',
+                'verbose_name_plural': 'Статистика ингредиентов по дням',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyactiveuser',
+            constraint=models.UniqueConstraint(fields=('date', 'user_id'), name='unique_daily_active_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyrecipestats',
+            constraint=models.UniqueConstraint(fields=('date', 'recipe'), name='unique_daily_recipe_stats'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailyingredientstats',
+            constraint=models.UniqueConstraint(fields=('date', 'ingredient'), name='unique_daily_ingredient_stats'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:27
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def mark_popular_authors(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    PopularAuthor = apps.get_model('recipes', 'PopularAuthor')
+    PopularAuthor.objects.bulk_create(
+        [
+            PopularAuthor(author_id=author_id)
+            for author_id in Follow.objects.values('author_id').annotate(
+                total=Count('id')
+            ).filter(
+                total__gte=settings.FEED_FANOUT_THRESHOLD
+            ).values_list('author_id', flat=True).order_by()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_follow_suggestions'),
+        ('recipes', '0011_media_files'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='users.user', verbose_name='Автор')),
+            ],
+            options={
+                'verbose_name': 'Популярный автор',
+                'verbose_name_plural': 'Популярные авторы',
+            },
+        ),
+        migrations.RunPython(mark_popular_authors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:33
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def number_existing_changes(apps, schema_editor):
+    Change = apps.get_model('recipes', 'Change')
+    StatsWatermark = apps.get_model('recipes', 'StatsWatermark')
+    Change.objects.update(position=F('id'))
+    StatsWatermark.objects.update_or_create(
+        name='change_sequence',
+        defaults={
+            'position': Change.objects.aggregate(last=Max('id'))['last'] or 0
+        }
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_popular_author'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_user_id_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_public_id_idx',
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='position',
+            field=models.BigIntegerField(null=True, unique=True, verbose_name='Номер в журнале'),
+        ),
+        migrations.RunPython(number_existing_changes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user_id', 'position'], name='change_user_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['public', 'position'], name='change_public_position_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(condition=models.Q(('position__isnull', True)), fields=['id'], name='change_unsequenced_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:51
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def count_followers(apps, schema_editor):
+    Follow = apps.get_model('users', 'Follow')
+    FeedAuthor = apps.get_model('recipes', 'FeedAuthor')
+    PopularAuthor = apps.get_model('recipes', 'PopularAuthor')
+    popular = set(PopularAuthor.objects.values_list('author_id', flat=True))
+    now = timezone.now()
+    FeedAuthor.objects.bulk_create(
+        (
+            FeedAuthor(
+                author_id=author_id,
+                followers=total,
+                popular_since=now if author_id in popular else None
+            )
+            for author_id, total in Follow.objects.values(
+                'author_id'
+            ).annotate(
+                total=Count('id')
+            ).values_list('author_id', 'total').order_by()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_event_ticket'),
+        ('recipes', '0014_change_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedAuthor',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='users.user', verbose_name='Автор')),
+                ('followers', models.PositiveIntegerField(default=0, verbose_name='Подписчики')),
+                ('popular_since', models.DateTimeField(blank=True, null=True, verbose_name='Популярен с')),
+            ],
+            options={
+                'verbose_name': 'Автор в лентах',
+                'verbose_name_plural': 'Авторы в лентах',
+            },
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+        migrations.DeleteModel(
+            name='PopularAuthor',
+        ),
+    ]
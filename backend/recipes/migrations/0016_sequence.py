@@ -0,0 +1,34 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:54
+
+from django.db import migrations, models
+
+
+def move_change_sequence(apps, schema_editor):
+    StatsWatermark = apps.get_model('recipes', 'StatsWatermark')
+    Sequence = apps.get_model('recipes', 'Sequence')
+    watermark = StatsWatermark.objects.filter(name='change_sequence').first()
+    if watermark is not None:
+        Sequence.objects.create(name='change', value=watermark.position)
+        watermark.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0015_feed_author'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=32, primary_key=True, serialize=False, verbose_name='Название')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Счётчик',
+                'verbose_name_plural': 'Счётчики',
+            },
+        ),
+        migrations.RunPython(move_change_sequence, migrations.RunPython.noop),
+    ]
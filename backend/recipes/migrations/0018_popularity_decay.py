@@ -0,0 +1,24 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0017_recipe_image_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityDecay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('decayed_at', models.DateTimeField(verbose_name='Последнее затухание')),
+            ],
+            options={
+                'verbose_name': 'Затухание популярности',
+                'verbose_name_plural': 'Затухание популярности',
+            },
+        ),
+    ]
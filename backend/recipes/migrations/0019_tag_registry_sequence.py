@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def move_tag_registry_version(apps, schema_editor):
+    StatsWatermark = apps.get_model('recipes', 'StatsWatermark')
+    Sequence = apps.get_model('recipes', 'Sequence')
+    watermark = StatsWatermark.objects.filter(name='tag_registry').first()
+    if watermark is not None:
+        Sequence.objects.update_or_create(
+            name='tag_registry', defaults={'value': watermark.position}
+        )
+        watermark.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0018_popularity_decay'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            move_tag_registry_version, migrations.RunPython.noop
+        ),
+    ]
@@ -6,6 +6,7 @@ from django.core.validators import (
 from django.db import models
 from django.db.models import UniqueConstraint
 
+from recipes.storage import recipe_image_storage
 from users.models import User
 
 
@@ -74,6 +75,7 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='recipes/image/',
+        storage=recipe_image_storage,
         verbose_name='Изображение'
     )
     text = models.TextField(verbose_name='Описание')
@@ -98,11 +100,46 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True
+    )
+    popularity = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-popularity', '-id'),
+                name='recipe_popularity_idx'
+            ),
+            models.Index(
+                fields=('-pub_date',),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('cooking_time', '-pub_date'),
+                name='recipe_cooking_time_idx'
+            ),
+            models.Index(
+                fields=('name', 'id'),
+                name='recipe_name_idx'
+            ),
+            models.Index(
+                fields=('image',),
+                name='recipe_image_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -172,3 +209,385 @@ class IngredientRecipe(models.Model):
         ordering = ('-id',)
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты рецепта'
+        indexes = [
+            models.Index(
+                fields=('recipe', '-id'),
+                name='ingredientrecipe_recipe_idx'
+            ),
+        ]
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Читатель',
+        related_name='feed'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор рецепта',
+        related_name='+'
+    )
+    pub_date = models.DateTimeField(verbose_name='Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date'),
+                name='feed_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author', '-pub_date'),
+                name='feed_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} :: {self.recipe}'
+
+
+class FeedAuthor(models.Model):
+    """Счётчик подписчиков автора и способ доставки его рецептов в ленты.
+
+    Рецепты популярного автора (popular_since задано) не раскладываются
+    по лентам, а подтягиваются при чтении. Поддерживается сигналами
+    подписок (feed.add_followers).
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Автор',
+        related_name='+'
+    )
+    followers = models.PositiveIntegerField(
+        verbose_name='Подписчики',
+        default=0
+    )
+    popular_since = models.DateTimeField(
+        verbose_name='Популярен с',
+        null=True,
+        blank=True
+    )
+
+    class Meta:
+        verbose_name = 'Автор в лентах'
+        verbose_name_plural = 'Авторы в лентах'
+
+    def __str__(self):
+        return f'{self.author}: {self.followers}'
+
+
+class RecipeSignature(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='signature'
+    )
+    minhash = models.BinaryField(verbose_name='MinHash-подпись')
+    computed_at = models.DateTimeField(verbose_name='Дата расчёта')
+
+    class Meta:
+        verbose_name = 'Подпись рецепта'
+        verbose_name_plural = 'Подписи рецептов'
+
+    def __str__(self):
+        return str(self.recipe)
+
+
+class SimilarRecipe(models.Model):
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='similar'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Похожий рецепт',
+        related_name='+'
+    )
+    score = models.FloatField(verbose_name='Сходство')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} ~ {self.similar}'
+
+
+class Change(models.Model):
+    RECIPE = 'recipe'
+    RECIPE_INGREDIENTS = 'recipe_ingredients'
+    RECIPE_TAGS = 'recipe_tags'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    FOLLOW = 'follow'
+    ENTITIES = (
+        (RECIPE, 'Рецепт'),
+        (RECIPE_INGREDIENTS, 'Ингредиенты рецепта'),
+        (RECIPE_TAGS, 'Теги рецепта'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Корзина'),
+        (FOLLOW, 'Подписка'),
+    )
+    CREATE = 'create'
+    UPDATE = 'update'
+    DELETE = 'delete'
+    ACTIONS = (
+        (CREATE, 'Создание'),
+        (UPDATE, 'Изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    entity = models.CharField(
+        verbose_name='Сущность',
+        max_length=32,
+        choices=ENTITIES
+    )
+    action = models.CharField(
+        verbose_name='Действие',
+        max_length=8,
+        choices=ACTIONS
+    )
+    object_id = models.BigIntegerField(verbose_name='Объект')
+    user_id = models.BigIntegerField(
+        verbose_name='Пользователь',
+        null=True
+    )
+    public = models.BooleanField(verbose_name='Видно всем', default=False)
+    created_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now_add=True
+    )
+    position = models.BigIntegerField(
+        verbose_name='Номер в журнале',
+        null=True,
+        unique=True
+    )
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+        indexes = [
+            models.Index(
+                fields=('user_id', 'position'),
+                name='change_user_position_idx'
+            ),
+            models.Index(
+                fields=('public', 'position'),
+                name='change_public_position_idx'
+            ),
+            models.Index(
+                fields=('id',),
+                condition=models.Q(position__isnull=True),
+                name='change_unsequenced_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.entity} {self.action} {self.object_id}'
+
+
+class PopularityDecay(models.Model):
+    """Время последнего затухания популярности (одна строка)."""
+    decayed_at = models.DateTimeField(verbose_name='Последнее затухание')
+
+    class Meta:
+        verbose_name = 'Затухание популярности'
+        verbose_name_plural = 'Затухание популярности'
+
+    def __str__(self):
+        return str(self.decayed_at)
+
+
+class Sequence(models.Model):
+    """Именованный монотонный счётчик: номера журнала изменений,
+    версия реестра тегов."""
+    name = models.CharField(
+        verbose_name='Название',
+        max_length=32,
+        primary_key=True
+    )
+    value = models.BigIntegerField(
+        verbose_name='Значение',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчик'
+        verbose_name_plural = 'Счётчики'
+
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+
+class StatsWatermark(models.Model):
+    name = models.CharField(
+        verbose_name='Название',
+        max_length=32,
+        unique=True
+    )
+    position = models.BigIntegerField(
+        verbose_name='Последнее обработанное изменение',
+        default=0
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата обновления',
+        auto_now=True
+    )
+
+    class Meta:
+        verbose_name = 'Отметка агрегации'
+        verbose_name_plural = 'Отметки агрегации'
+
+    def __str__(self):
+        return f'{self.name}: {self.position}'
+
+
+class DailyStats(models.Model):
+    date = models.DateField(verbose_name='День', unique=True)
+    recipes_created = models.PositiveIntegerField(
+        verbose_name='Новых рецептов',
+        default=0
+    )
+    favorites_added = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0
+    )
+    shopping_carts_added = models.PositiveIntegerField(
+        verbose_name='Добавлений в корзину',
+        default=0
+    )
+    active_users = models.PositiveIntegerField(
+        verbose_name='Активных пользователей',
+        default=0
+    )
+
+    class Meta:
+        ordering = ('-date',)
+        verbose_name = 'Статистика за день'
+        verbose_name_plural = 'Статистика по дням'
+
+    def __str__(self):
+        return str(self.date)
+
+
+class DailyActiveUser(models.Model):
+    date = models.DateField(verbose_name='День')
+    user_id = models.BigIntegerField(verbose_name='Пользователь')
+
+    class Meta:
+        verbose_name = 'Активный пользователь за день'
+        verbose_name_plural = 'Активные пользователи по дням'
+        constraints = [
+            UniqueConstraint(
+                fields=('date', 'user_id'),
+                name='unique_daily_active_user'
+            )
+        ]
+
+
+class DailyRecipeStats(models.Model):
+    date = models.DateField(verbose_name='День')
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='+'
+    )
+    favorites = models.PositiveIntegerField(
+        verbose_name='Добавлений в избранное',
+        default=0
+    )
+    shopping_carts = models.PositiveIntegerField(
+        verbose_name='Добавлений в корзину',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Статистика рецепта за день'
+        verbose_name_plural = 'Статистика рецептов по дням'
+        constraints = [
+            UniqueConstraint(
+                fields=('date', 'recipe'),
+                name='unique_daily_recipe_stats'
+            )
+        ]
+
+
+class DailyIngredientStats(models.Model):
+    date = models.DateField(verbose_name='День')
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        verbose_name='Ингредиент',
+        related_name='+'
+    )
+    shopping_carts = models.PositiveIntegerField(
+        verbose_name='Добавлений в корзину',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Статистика ингредиента за день'
+        verbose_name_plural = 'Статистика ингредиентов по дням'
+        constraints = [
+            UniqueConstraint(
+                fields=('date', 'ingredient'),
+                name='unique_daily_ingredient_stats'
+            )
+        ]
+
+
+class MediaFile(models.Model):
+    name = models.CharField(
+        verbose_name='Путь к файлу',
+        max_length=255,
+        unique=True
+    )
+    refcount = models.PositiveIntegerField(
+        verbose_name='Число ссылок',
+        default=0
+    )
+
+    class Meta:
+        verbose_name = 'Медиафайл'
+        verbose_name_plural = 'Медиафайлы'
+
+    def __str__(self):
+        return f'{self.name} ({self.refcount})'
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db import connection, transaction
+
+from recipes import pubsub
+from recipes.models import Change, Sequence
+
+SEQUENCE = 'change'
+
+LIVE_ENTITIES = (Change.FAVORITE, Change.SHOPPING_CART, Change.FOLLOW)
+
+
+class Recorded:
+    """Отметка в on_commit о записи, уже сделанной в этой транзакции.
+
+    Отметки живут в списке on_commit соединения, поэтому откат
+    транзакции или точки сохранения снимает их вместе с самой записью.
+    """
+
+    def __init__(self, key):
+        self.key = key
+
+    def __call__(self):
+        pass
+
+
+def record(entity, action, object_id, user_id=None, public=False):
+    """Пишет запись в журнал изменений.
+
+    Вызывается из обработчиков сигналов, то есть в той же транзакции,
+    что и само изменение. Номер в журнале запись получит позже,
+    от sequence().
+    """
+    Change.objects.create(
+        entity=entity,
+        action=action,
+        object_id=object_id,
+        user_id=user_id,
+        public=public
+    )
+
+
+def record_once(entity, action, object_id, user_id=None, public=False):
+    """record(), но не больше одной одинаковой записи на транзакцию:
+    пересборка ингредиентов или тегов рецепта даёт одну запись."""
+    key = (entity, action, object_id, user_id)
+    if connection.in_atomic_block:
+        if any(
+            isinstance(callback, Recorded) and callback.key == key
+            for _, callback in connection.run_on_commit
+        ):
+            return
+        transaction.on_commit(Recorded(key))
+    record(entity, action, object_id, user_id, public)
+
+
+def last_position():
+    """Последний выданный номер; читается без блокировок."""
+    return Sequence.objects.filter(name=SEQUENCE).values_list(
+        'value', flat=True
+    ).first() or 0
+
+
+def sequence():
+    """Нумерует закоммиченные записи журнала; возвращает число
+    пронумерованных.
+
+    id выдаётся при вставке, а транзакции коммитятся не по порядку id,
+    поэтому курсор по id пропускал бы записи долгих транзакций. Номер
+    выдаётся под блокировкой счётчика SEQUENCE и только видимым, то есть
+    уже закоммиченным, записям: всё, что станет видно позже, получит
+    номер больше любого уже выданного.
+
+    Вызывается только фоновыми задачами (sequence_changes), читатели
+    журнала листают его по position без блокировок. После нумерации
+    SSE-подписчики будятся через pubsub.
+    """
+    if not Change.objects.filter(position__isnull=True).exists():
+        return 0
+    with transaction.atomic():
+        counter, _ = Sequence.objects.select_for_update().get_or_create(
+            name=SEQUENCE
+        )
+        changes = list(Change.objects.filter(
+            position__isnull=True
+        ).order_by('id').only('id')[:settings.CHANGES_SEQUENCE_BATCH_SIZE])
+        if not changes:
+            return 0
+        for number, change in enumerate(changes, counter.value + 1):
+            change.position = number
+        Change.objects.bulk_update(changes, ('position',), batch_size=1000)
+        counter.value += len(changes)
+        counter.save(update_fields=('value',))
+        pubsub.publish()
+    return len(changes)
@@ -0,0 +1,56 @@
+import threading
+
+from django.db import connection, transaction
+
+CHANNEL = 'foodgram_changes'
+
+_lock = threading.Lock()
+_listeners = []
+
+
+def attach(loop, callback):
+    """Подписывает callback событийного цикла на уведомления процесса."""
+    with _lock:
+        _listeners[:] = [
+            (listener_loop, listener) for listener_loop, listener
+            in _listeners if not listener_loop.is_closed()
+        ]
+        _listeners.append((loop, callback))
+
+
+def notify():
+    """Будит подписчиков; вызывается из любого потока после коммита."""
+    with _lock:
+        listeners = list(_listeners)
+    for loop, callback in listeners:
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(callback)
+
+
+def publish():
+    """Будит подписчиков после коммита текущей транзакции.
+
+    SSE работает в отдельном процессе, поэтому на Postgres нумерация
+    журнала (outbox.sequence) сопровождается NOTIFY CHANNEL: сервер
+    доставит его слушателям только при коммите. Подписчики этого
+    же процесса (и все подписчики на других СУБД) будятся через notify.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'NOTIFY {CHANNEL}')
+    transaction.on_commit(notify)
+
+
+def listen():
+    """Открывает отдельное соединение Postgres, слушающее CHANNEL.
+
+    Уведомления приходят вне транзакций, поэтому соединение работает в
+    autocommit; его сокет добавляется в событийный цикл SSE-процесса.
+    """
+    listener = connection.get_new_connection(
+        connection.get_connection_params()
+    )
+    listener.autocommit = True
+    with listener.cursor() as cursor:
+        cursor.execute(f'LISTEN {CHANNEL}')
+    return listener
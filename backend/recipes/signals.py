@@ -0,0 +1,210 @@
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save
+)
+from django.dispatch import receiver
+
+from recipes import catalog, feed, media_cleanup, outbox
+from recipes.tag_registry import tag_registry
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (
+    IngredientRecipe,
+    ShoppingCart,
+    Ingredient,
+    Favorite,
+    Change,
+    Recipe,
+    Tag
+)
+from users.models import Follow
+
+_deleting = threading.local()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_new_recipe(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: feed.fan_out_recipe(instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def drop_from_ingredient_index(sender, instance, **kwargs):
+    recipe_id = instance.id
+    transaction.on_commit(lambda: ingredient_index.remove_recipe(recipe_id))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def refresh_ingredient_index(sender, instance, **kwargs):
+    ingredient_index.schedule_update(instance.recipe_id)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_old_image(sender, instance, raw, **kwargs):
+    if raw or not instance.pk:
+        return
+    instance._old_image = Recipe.objects.filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def count_image_references(sender, instance, created, raw, **kwargs):
+    old_image = instance.__dict__.pop('_old_image', None)
+    if raw or not created and old_image == instance.image.name:
+        return
+    media_cleanup.acquire(instance.image.name)
+    media_cleanup.release(old_image)
+
+
+@receiver(post_delete, sender=Recipe)
+def drop_deleted_image(sender, instance, **kwargs):
+    media_cleanup.release(instance.image.name)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, **kwargs):
+    if created:
+        feed.backfill_author(instance.user_id, instance.author_id)
+        feed.add_followers(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Follow)
+def clean_feed(sender, instance, **kwargs):
+    feed.remove_author(instance.user_id, instance.author_id)
+    feed.add_followers(instance.author_id, -1)
+
+
+def bump_popularity(recipe_id, weight):
+    Recipe.objects.filter(pk=recipe_id).update(
+        popularity=F('popularity') + weight
+    )
+
+
+@receiver(post_save, sender=Favorite)
+def favorite_added(sender, instance, created, **kwargs):
+    if created:
+        bump_popularity(
+            instance.recipe_id, settings.POPULARITY_FAVORITE_WEIGHT
+        )
+
+
+@receiver(post_save, sender=ShoppingCart)
+def cart_added(sender, instance, created, **kwargs):
+    if created:
+        bump_popularity(instance.recipe_id, settings.POPULARITY_CART_WEIGHT)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_catalog(sender, **kwargs):
+    catalog.schedule_rebuild()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def invalidate_tag_registry(sender, **kwargs):
+    tag_registry.invalidate()
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    outbox.record(
+        Change.RECIPE,
+        Change.CREATE if created else Change.UPDATE,
+        instance.id,
+        instance.author_id,
+        public=True
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def log_recipe_deleted(sender, instance, **kwargs):
+    outbox.record(
+        Change.RECIPE,
+        Change.DELETE,
+        instance.id,
+        instance.author_id,
+        public=True
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleting_recipe(sender, instance, **kwargs):
+    _deleting.recipes = getattr(_deleting, 'recipes', set()) | {instance.pk}
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_deleting_recipe(sender, instance, **kwargs):
+    _deleting.recipes = getattr(_deleting, 'recipes', set()) - {instance.pk}
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def log_recipe_ingredient(sender, instance, **kwargs):
+    """Одна запись на рецепт за транзакцию, сколько бы строк ни
+    поменялось. Каскадное удаление вместе с рецептом не пишется: его
+    покрывает запись об удалении самого рецепта."""
+    if instance.recipe_id in getattr(_deleting, 'recipes', ()):
+        return
+    outbox.record_once(
+        Change.RECIPE_INGREDIENTS,
+        Change.UPDATE,
+        instance.recipe_id,
+        public=True
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def log_recipe_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    for recipe_id in (pk_set or ()) if reverse else (instance.pk,):
+        outbox.record_once(
+            Change.RECIPE_TAGS,
+            Change.UPDATE,
+            recipe_id,
+            public=True
+        )
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def log_user_recipe(sender, instance, **kwargs):
+    created = kwargs.get('created')
+    if created is False:
+        return
+    outbox.record(
+        Change.FAVORITE if sender is Favorite else Change.SHOPPING_CART,
+        Change.CREATE if created else Change.DELETE,
+        instance.recipe_id,
+        instance.user_id
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def log_follow(sender, instance, **kwargs):
+    created = kwargs.get('created')
+    if created is False:
+        return
+    outbox.record(
+        Change.FOLLOW,
+        Change.CREATE if created else Change.DELETE,
+        instance.author_id,
+        instance.user_id
+    )
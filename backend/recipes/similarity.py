@@ -0,0 +1,100 @@
+import heapq
+from collections import defaultdict
+
+import numpy as np
+
+MERSENNE_PRIME = (1 << 31) - 1
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_generator = np.random.RandomState(2023)
+_A = _generator.randint(1, MERSENNE_PRIME, size=NUM_PERM, dtype=np.int64)
+_B = _generator.randint(0, MERSENNE_PRIME, size=NUM_PERM, dtype=np.int64)
+
+_state = {}
+
+
+def minhash(ingredient_ids):
+    ids = np.fromiter(ingredient_ids, dtype=np.int64)
+    if not len(ids):
+        return np.full(NUM_PERM, MERSENNE_PRIME, dtype=np.int64)
+    hashes = (_A[:, None] * ids[None, :] + _B[:, None]) % MERSENNE_PRIME
+    return hashes.min(axis=1)
+
+
+def signatures_chunk(items):
+    return [
+        (recipe_id, minhash(ingredient_ids).tobytes())
+        for recipe_id, ingredient_ids in items
+    ]
+
+
+def is_empty(signature):
+    """Подпись рецепта без ингредиентов: все значения равны модулю,
+    которого настоящие хэши не достигают."""
+    return signature[0] == MERSENNE_PRIME
+
+
+def band_keys(signature):
+    return [
+        (band, signature[band * ROWS:(band + 1) * ROWS].tobytes())
+        for band in range(BANDS)
+    ]
+
+
+def build_buckets(signatures):
+    buckets = defaultdict(list)
+    for recipe_id, signature in signatures.items():
+        if is_empty(signature):
+            continue
+        for key in band_keys(signature):
+            buckets[key].append(recipe_id)
+    return buckets
+
+
+def candidates(recipe_id, signatures, buckets):
+    found = set()
+    if is_empty(signatures[recipe_id]):
+        return found
+    for key in band_keys(signatures[recipe_id]):
+        found.update(buckets.get(key, ()))
+    found.discard(recipe_id)
+    return found
+
+
+def init_worker(signatures, buckets, ingredients, tags, top_k, tag_boost):
+    _state.update(
+        signatures=signatures,
+        buckets=buckets,
+        ingredients=ingredients,
+        tags=tags,
+        top_k=top_k,
+        tag_boost=tag_boost,
+    )
+
+
+def score(first, second):
+    ingredients = _state['ingredients']
+    tags = _state['tags']
+    left, right = ingredients[first], ingredients[second]
+    union = len(left | right)
+    jaccard = len(left & right) / union if union else 0.0
+    shared_tags = len(tags.get(first, set()) & tags.get(second, set()))
+    return jaccard + _state['tag_boost'] * shared_tags
+
+
+def neighbours_chunk(recipe_ids):
+    result = []
+    for recipe_id in recipe_ids:
+        scored = (
+            (score(recipe_id, other), other)
+            for other in candidates(
+                recipe_id, _state['signatures'], _state['buckets']
+            )
+        )
+        best = heapq.nlargest(_state['top_k'], scored)
+        result.extend(
+            (recipe_id, other, value) for value, other in best if value > 0
+        )
+    return result
@@ -0,0 +1,49 @@
+import hashlib
+import os
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Сохраняет файлы под SHA-256 содержимого в каталогах вида ab/cd/.
+
+    Одинаковые загрузки попадают в один файл, поэтому содержимое по
+    имени никогда не меняется и его можно кэшировать навсегда.
+
+    Перед записью или повторным использованием файла берётся блокировка
+    строки MediaFile: фоновая очистка (media_cleanup) удаляет файл под
+    той же блокировкой, поэтому не может удалить его, пока транзакция,
+    сохраняющая рецепт с этим файлом, не закоммитится. Ссылка
+    учитывается (media_cleanup.acquire) в той же транзакции.
+    """
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        value = digest.hexdigest()
+        return '/'.join(filter(None, (
+            directory.replace(os.sep, '/'),
+            value[:2],
+            value[2:4],
+            value + extension
+        )))
+
+    def _save(self, name, content):
+        name = self.hashed_name(name, content)
+        media_file = apps.get_model('recipes', 'MediaFile')
+        with transaction.atomic():
+            media_file.objects.select_for_update().get_or_create(name=name)
+            if self.exists(name):
+                return name
+            return super()._save(name, content)
+
+
+recipe_image_storage = ContentAddressedStorage()
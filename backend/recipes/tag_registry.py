@@ -0,0 +1,135 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from recipes.models import Recipe, Sequence, Tag
+
+VERSION = 'tag_registry'
+
+
+class TagRegistry:
+    """Все теги в памяти процесса: id -> сериализованный тег, slug -> id.
+
+    Сверяется с номером версии в БД (счётчик VERSION) не чаще раза в
+    TAG_REGISTRY_CHECK_INTERVAL секунд; сохранение и удаление тега
+    увеличивают номер в той же транзакции, так что другие воркеры видят
+    изменение не позже чем через этот интервал. Раз в TAG_REGISTRY_TTL
+    секунд реестр перечитывается в любом случае.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_slug = {}
+        self._version = None
+        self._loaded_at = None
+        self._checked_at = None
+
+    @staticmethod
+    def _current_version():
+        return Sequence.objects.filter(name=VERSION).values_list(
+            'value', flat=True
+        ).first() or 0
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        expired = (
+            self._loaded_at is None
+            or now - self._loaded_at >= settings.TAG_REGISTRY_TTL
+        )
+        if (
+            not expired
+            and now - self._checked_at < settings.TAG_REGISTRY_CHECK_INTERVAL
+        ):
+            return
+        version = self._current_version()
+        self._checked_at = now
+        if expired or version != self._version:
+            self.reload(version)
+
+    def _reload_on_miss(self):
+        """Тег мог появиться в другом воркере: сверяем версию, но не
+        чаще раза в TAG_REGISTRY_MISS_INTERVAL."""
+        now = time.monotonic()
+        if now - self._checked_at < settings.TAG_REGISTRY_MISS_INTERVAL:
+            return
+        version = self._current_version()
+        self._checked_at = now
+        if version != self._version:
+            self.reload(version)
+
+    def reload(self, version=None):
+        tags = {
+            tag['id']: tag
+            for tag in Tag.objects.order_by('name').values(
+                'color', 'name', 'slug', 'id'
+            )
+        }
+        with self._lock:
+            self._by_id = tags
+            self._by_slug = {tag['slug']: pk for pk, tag in tags.items()}
+            self._version = (
+                self._current_version() if version is None else version
+            )
+            self._loaded_at = self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """Увеличивает номер версии в текущей транзакции, чтобы все
+        воркеры перечитали теги."""
+        Sequence.objects.get_or_create(name=VERSION)
+        Sequence.objects.filter(name=VERSION).update(value=F('value') + 1)
+        transaction.on_commit(self.expire)
+
+    def expire(self):
+        """Следующее обращение перечитает теги."""
+        self._loaded_at = None
+
+    def missing_ids(self, ids):
+        """Возвращает id, которых нет среди тегов; при промахе реестр
+        перечитывается один раз.
+
+        Тег, удалённый в другом воркере, устаревший реестр может
+        пропустить; тогда запись упадёт на внешнем ключе (см.
+        CreateRecipeSerializer.set_tags).
+        """
+        self._ensure_fresh()
+        if all(pk in self._by_id for pk in ids):
+            return []
+        self._reload_on_miss()
+        return [pk for pk in ids if pk not in self._by_id]
+
+    def ids_for_slugs(self, slugs):
+        self._ensure_fresh()
+        if any(slug not in self._by_slug for slug in slugs):
+            self._reload_on_miss()
+        by_slug = self._by_slug
+        return [by_slug[slug] for slug in slugs if slug in by_slug]
+
+    def has_slug(self, slug):
+        return bool(self.ids_for_slugs([slug]))
+
+    def render(self, tag_ids):
+        """Сериализует теги по списку id в порядке сортировки Tag."""
+        self._ensure_fresh()
+        by_id = self._by_id
+        tags = [by_id[pk] for pk in tag_ids if pk in by_id]
+        tags.sort(key=lambda tag: tag['name'])
+        return [dict(tag) for tag in tags]
+
+
+def load_tag_ids(recipes):
+    """Одним запросом к M2M-таблице проставляет рецептам tag_ids."""
+    recipes = [recipe for recipe in recipes if recipe is not None]
+    tag_ids = {recipe.id: [] for recipe in recipes}
+    for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+        recipe_id__in=list(tag_ids)
+    ).values_list('recipe_id', 'tag_id'):
+        tag_ids[recipe_id].append(tag_id)
+    for recipe in recipes:
+        recipe.tag_ids = tag_ids[recipe.id]
+
+
+tag_registry = TagRegistry()
@@ -0,0 +1,57 @@
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from recipes import catalog
+from recipes.models import Tag
+
+
+class CatalogTests(TransactionTestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def create_tag(self, slug):
+        return Tag.objects.create(name=slug, color=f'#{slug:0>6}', slug=slug)
+
+    def published_slugs(self):
+        version = catalog.current_version()
+        with open(catalog.catalog_path(f'catalog.{version}.json')) as source:
+            return {tag['slug'] for tag in json.load(source)['tags']}
+
+    def test_rolled_back_transaction_does_not_block_rebuilds(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.create_tag('1')
+                raise RuntimeError
+        self.create_tag('2')
+        self.assertEqual(self.published_slugs(), {'2'})
+
+    def test_rebuild_scheduled_once_per_transaction(self):
+        with mock.patch.object(
+            catalog, 'build_catalog', wraps=catalog.build_catalog
+        ) as build:
+            with transaction.atomic():
+                self.create_tag('1')
+                self.create_tag('2')
+        build.assert_called_once_with()
+
+    def test_previous_version_kept_until_next_publish(self):
+        first = catalog.build_catalog()
+        self.create_tag('1')
+        second = catalog.current_version()
+        self.create_tag('2')
+        names = set(os.listdir(catalog.catalog_path()))
+        self.assertNotIn(f'catalog.{first}.json', names)
+        self.assertIn(f'catalog.{second}.json', names)
+        self.assertIn(f'catalog.{second}.json.gz', names)
+        self.assertFalse(any(name.startswith('.tmp-') for name in names))
@@ -0,0 +1,93 @@
+import json
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from recipes.models import FeedAuthor, FeedEntry, Recipe
+from users.models import Follow, User
+
+
+@override_settings(FEED_FANOUT_THRESHOLD=3, FEED_FANOUT_LEAVE_THRESHOLD=2)
+class FeedTests(APITestCase):
+
+    def setUp(self):
+        self.author, *self.readers = (
+            User.objects.create_user(
+                username=name,
+                email=f'{name}@example.com',
+                password='password',
+                first_name=name,
+                last_name=name
+            )
+            for name in ('author', 'first', 'second', 'third')
+        )
+
+    def follow(self, reader):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.create(user=reader, author=self.author)
+
+    def unfollow(self, reader):
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.get(user=reader, author=self.author).delete()
+
+    def publish(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Recipe.objects.create(
+                author=self.author,
+                name='recipe',
+                text='text',
+                cooking_time=10,
+                image='recipes/image/recipe.png'
+            )
+
+    def state(self):
+        return FeedAuthor.objects.get(author=self.author)
+
+    def feed(self, reader):
+        return set(FeedEntry.objects.filter(user=reader).values_list(
+            'recipe_id', flat=True
+        ))
+
+    def test_popularity_has_hysteresis(self):
+        for reader in self.readers:
+            self.follow(reader)
+        self.assertEqual(self.state().followers, 3)
+        self.assertIsNotNone(self.state().popular_since)
+        self.unfollow(self.readers[0])
+        self.assertIsNotNone(self.state().popular_since)
+        self.follow(self.readers[0])
+        self.unfollow(self.readers[0])
+        self.unfollow(self.readers[1])
+        self.assertEqual(self.state().followers, 1)
+        self.assertIsNone(self.state().popular_since)
+
+    def test_leaving_popular_fans_out_missed_recipes(self):
+        for reader in self.readers:
+            self.follow(reader)
+        recipe = self.publish()
+        self.assertEqual(self.feed(self.readers[2]), set())
+        self.unfollow(self.readers[0])
+        self.unfollow(self.readers[1])
+        self.assertEqual(self.feed(self.readers[2]), {recipe.id})
+        later = self.publish()
+        self.assertEqual(self.feed(self.readers[2]), {recipe.id, later.id})
+
+    def test_imported_follows_fill_feeds_and_counters(self):
+        recipe = self.publish()
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl') as dump:
+            for reader in self.readers:
+                dump.write(json.dumps({
+                    'type': 'follow',
+                    'user': reader.email,
+                    'author': self.author.email
+                }) + '\n')
+            dump.flush()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('import_recipes', dump.name, stdout=StringIO())
+        self.assertEqual(self.state().followers, 3)
+        self.assertIsNotNone(self.state().popular_since)
+        for reader in self.readers:
+            self.assertEqual(self.feed(reader), {recipe.id})
@@ -0,0 +1,81 @@
+from unittest import mock
+
+import numpy as np
+from django.db import transaction
+from django.test import TestCase
+
+from recipes.ingredient_index import IngredientIndex, RecipeUpdate
+from recipes.models import Ingredient, IngredientRecipe, Recipe
+from users.models import User
+
+
+class IngredientIndexTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='author',
+            last_name='author'
+        )
+        self.salt, self.sugar, self.flour = (
+            Ingredient.objects.create(name=name, measurement_unit='g')
+            for name in ('salt', 'sugar', 'flour')
+        )
+        self.recipe = self.create_recipe()
+        self.index = IngredientIndex()
+
+    def create_recipe(self):
+        return Recipe.objects.create(
+            author=self.user,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+            image='recipes/image/recipe.png'
+        )
+
+    def add(self, recipe, *ingredients):
+        for ingredient in ingredients:
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+
+    def test_duplicate_rows_do_not_inflate_sizes(self):
+        self.add(self.recipe, self.salt, self.salt, self.sugar)
+        self.assertEqual(
+            self.index.search([self.salt.id]), [(self.recipe.id, 1, 1)]
+        )
+
+    def test_one_update_per_recipe_per_transaction(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.add(self.recipe, self.salt, self.sugar, self.flour)
+                self.recipe.ingredients.clear()
+                self.add(self.recipe, self.salt)
+        self.assertEqual(
+            [callback.recipe_id for callback in callbacks
+             if isinstance(callback, RecipeUpdate)],
+            [self.recipe.id]
+        )
+
+    def test_update_during_first_build_is_kept(self):
+        self.add(self.recipe, self.salt)
+        other = self.create_recipe()
+        fromiter = np.fromiter
+
+        def read_then_update(*args, **kwargs):
+            try:
+                return fromiter(*args, **kwargs)
+            finally:
+                self.add(other, self.salt)
+                self.index.update_recipe(other.id)
+
+        with mock.patch('numpy.fromiter', read_then_update):
+            self.index.rebuild()
+        found = self.index.search([self.salt.id])
+        self.assertEqual(
+            {recipe_id for recipe_id, _, _ in found},
+            {self.recipe.id, other.id}
+        )
+        self.assertFalse(self.index._dirty)
@@ -0,0 +1,124 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from recipes.media_cleanup import delete_unreferenced
+from recipes.models import MediaFile, Recipe
+from recipes.storage import recipe_image_storage
+from users.models import User
+
+
+class MediaCleanupTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='author',
+            last_name='author'
+        )
+
+    def save(self, content=b'image'):
+        return recipe_image_storage.save(
+            'recipes/image/photo.png', ContentFile(content)
+        )
+
+    def create_recipe(self, image):
+        return Recipe.objects.create(
+            author=self.user,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+            image=image
+        )
+
+    def test_save_registers_file_before_reuse(self):
+        name = self.save()
+        self.assertEqual(self.save(), name)
+        self.assertEqual(MediaFile.objects.get(name=name).refcount, 0)
+
+    def test_referenced_file_is_kept(self):
+        name = self.save()
+        self.create_recipe(name)
+        self.assertFalse(delete_unreferenced(name))
+        self.assertTrue(recipe_image_storage.exists(name))
+
+    def test_unreferenced_file_is_deleted(self):
+        name = self.save()
+        self.create_recipe(name).delete()
+        self.assertTrue(delete_unreferenced(name))
+        self.assertFalse(recipe_image_storage.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_file_without_counter_is_checked_against_recipes(self):
+        name = self.save()
+        self.create_recipe(name)
+        MediaFile.objects.all().delete()
+        self.assertFalse(delete_unreferenced(name))
+        self.assertEqual(MediaFile.objects.get(name=name).refcount, 1)
+
+    def test_import_counts_image_references(self):
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source)
+        os.makedirs(os.path.join(source, 'recipes/image'))
+        for photo in ('first.png', 'second.png'):
+            with open(os.path.join(source, 'recipes/image', photo), 'wb') as f:
+                f.write(b'same content')
+        dump = os.path.join(source, 'dump.jsonl')
+        with open(dump, 'w') as output:
+            for key, photo in enumerate(('first.png', 'second.png')):
+                output.write(json.dumps({
+                    'type': 'recipe',
+                    'key': key,
+                    'author': self.user.email,
+                    'name': f'recipe {key}',
+                    'image': f'recipes/image/{photo}',
+                    'text': 'text',
+                    'cooking_time': 10,
+                    'pub_date': '2023-01-01T00:00:00+00:00',
+                    'ingredients': [],
+                    'tags': [],
+                }) + '\n')
+        call_command(
+            'import_recipes', dump, media_from=source, stdout=StringIO()
+        )
+        names = set(Recipe.objects.values_list('image', flat=True))
+        self.assertEqual(len(names), 1)
+        self.assertEqual(
+            MediaFile.objects.get(name=names.pop()).refcount, 2
+        )
+
+    def test_recount_fixes_counters_in_batches(self):
+        kept, dropped = self.save(b'kept'), self.save(b'dropped')
+        self.create_recipe(kept)
+        self.create_recipe(kept)
+        MediaFile.objects.filter(name=kept).delete()
+        MediaFile.objects.filter(name=dropped).update(refcount=5)
+        call_command(
+            'gc_media', recount=True, batch_size=1, min_age=-60,
+            stdout=StringIO()
+        )
+        self.assertEqual(
+            dict(MediaFile.objects.values_list('name', 'refcount')),
+            {kept: 2, dropped: 0}
+        )
+
+    def test_gc_reports_files_by_counter(self):
+        kept, orphan = self.save(b'kept'), self.save(b'orphan')
+        self.create_recipe(kept)
+        output = StringIO()
+        call_command('gc_media', min_age=-60, stdout=output)
+        self.assertIn(orphan, output.getvalue())
+        self.assertNotIn(kept + '\n', output.getvalue())
@@ -0,0 +1,200 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APITransactionTestCase
+
+from recipes import outbox
+from recipes.models import (
+    Change,
+    DailyStats,
+    Ingredient,
+    IngredientRecipe,
+    Recipe
+)
+from users.models import User
+
+
+class OutboxTests(APITransactionTestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings = override_settings(MEDIA_ROOT=media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='author',
+            last_name='author'
+        )
+        self.client.force_authenticate(self.user)
+
+    def create_recipe(self, **kwargs):
+        return Recipe.objects.create(
+            author=self.user,
+            name='recipe',
+            text='text',
+            cooking_time=10,
+            image='recipes/image/recipe.png',
+            **kwargs
+        )
+
+    def changes(self, since=0):
+        call_command('sequence_changes', once=True, stdout=StringIO())
+        return self.client.get(f'/api/changes/?since={since}').data
+
+    def test_late_commit_with_lower_id_is_not_skipped(self):
+        later = self.create_recipe(id=100)
+        page = self.changes()
+        self.assertEqual(
+            [change['object_id'] for change in page['results']], [later.id]
+        )
+        earlier = self.create_recipe(id=50)
+        self.assertEqual(
+            [
+                change['object_id']
+                for change in self.changes(page['cursor'])['results']
+            ],
+            [earlier.id]
+        )
+
+    def test_sequence_numbers_only_new_changes(self):
+        self.create_recipe()
+        self.assertEqual(outbox.sequence(), 1)
+        first = outbox.last_position()
+        self.assertEqual(outbox.sequence(), 0)
+        self.create_recipe()
+        self.assertEqual(outbox.sequence(), 1)
+        self.assertEqual(outbox.last_position(), first + 1)
+        self.assertFalse(Change.objects.filter(position__isnull=True))
+
+    def test_reading_changes_does_not_sequence(self):
+        self.create_recipe()
+        self.client.get('/api/changes/')
+        self.assertTrue(Change.objects.filter(position__isnull=True))
+
+    def test_ingredient_rebuild_is_logged_once(self):
+        recipe = self.create_recipe()
+        ingredients = [
+            Ingredient.objects.create(name=f'i{number}', measurement_unit='g')
+            for number in range(5)
+        ]
+        for ingredient in ingredients:
+            IngredientRecipe.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=1
+            )
+        Change.objects.all().delete()
+        with transaction.atomic():
+            recipe.ingredients.clear()
+            for ingredient in ingredients:
+                IngredientRecipe.objects.create(
+                    recipe=recipe, ingredient=ingredient, amount=2
+                )
+            recipe.tags.clear()
+        self.assertEqual(
+            sorted(Change.objects.values_list('entity', flat=True)),
+            [Change.RECIPE_INGREDIENTS, Change.RECIPE_TAGS]
+        )
+
+    def test_rolled_back_change_does_not_suppress_later_ones(self):
+        recipe = self.create_recipe()
+        Change.objects.all().delete()
+        with transaction.atomic():
+            try:
+                with transaction.atomic():
+                    recipe.tags.clear()
+                    raise ValueError
+            except ValueError:
+                pass
+            recipe.tags.clear()
+        self.assertEqual(Change.objects.count(), 1)
+
+    def test_prune_removes_unsequenced_changes(self):
+        self.create_recipe()
+        Change.objects.update(
+            created_at=timezone.now() - timedelta(days=365)
+        )
+        call_command('prune_changes', stdout=StringIO())
+        self.assertFalse(Change.objects.exists())
+
+    def test_ingredient_delete_is_logged(self):
+        recipe = self.create_recipe()
+        ingredient = Ingredient.objects.create(
+            name='salt', measurement_unit='g'
+        )
+        link = IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+        Change.objects.all().delete()
+        link.delete()
+        self.assertEqual(
+            list(Change.objects.values_list('entity', 'action')),
+            [(Change.RECIPE_INGREDIENTS, Change.UPDATE)]
+        )
+
+    def test_recipe_delete_skips_cascaded_ingredients(self):
+        recipe = self.create_recipe()
+        ingredient = Ingredient.objects.create(
+            name='salt', measurement_unit='g'
+        )
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=1
+        )
+        Change.objects.all().delete()
+        recipe.delete()
+        self.assertEqual(
+            list(Change.objects.values_list('entity', 'action')),
+            [(Change.RECIPE, Change.DELETE)]
+        )
+
+    def test_daily_stats_follow_sequence(self):
+        self.create_recipe(id=100)
+        call_command('refresh_daily_stats', stdout=StringIO())
+        self.create_recipe(id=50)
+        call_command('refresh_daily_stats', stdout=StringIO())
+        self.assertEqual(
+            DailyStats.objects.get().recipes_created, 2
+        )
+
+    def test_late_change_for_earlier_day_counts_active_users_once(self):
+        reader = User.objects.create_user(
+            username='reader',
+            email='reader@example.com',
+            password='password',
+            first_name='reader',
+            last_name='reader'
+        )
+        today = timezone.now()
+        earlier = today - timedelta(days=3)
+
+        def favorite(user, created_at):
+            change = Change.objects.create(
+                entity=Change.FAVORITE,
+                action=Change.DELETE,
+                object_id=1,
+                user_id=user.id
+            )
+            Change.objects.filter(pk=change.pk).update(created_at=created_at)
+            call_command('refresh_daily_stats', stdout=StringIO())
+
+        favorite(self.user, earlier)
+        favorite(reader, today)
+        favorite(reader, earlier)
+        favorite(self.user, earlier)
+        self.assertEqual(
+            DailyStats.objects.get(
+                date=timezone.localdate(earlier)
+            ).active_users,
+            2
+        )
+        self.assertEqual(
+            DailyStats.objects.get(date=timezone.localdate()).active_users, 1
+        )
@@ -0,0 +1,57 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from recipes.models import PopularityDecay, Recipe
+from users.models import User
+
+
+@override_settings(POPULARITY_HALF_LIFE_HOURS=10)
+class DecayPopularityTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(
+            username='author',
+            email='author@example.com',
+            password='password',
+            first_name='author',
+            last_name='author'
+        )
+        self.hot, self.cold = (
+            Recipe.objects.create(
+                author=user,
+                name='recipe',
+                text='text',
+                cooking_time=10,
+                image='recipes/image/recipe.png',
+                popularity=popularity
+            )
+            for popularity in (8.0, 0.015)
+        )
+
+    def decay(self, hours_ago=None):
+        if hours_ago is not None:
+            PopularityDecay.objects.update_or_create(pk=1, defaults={
+                'decayed_at': timezone.now() - timedelta(hours=hours_ago)
+            })
+        call_command('decay_popularity', stdout=StringIO())
+        self.hot.refresh_from_db()
+        self.cold.refresh_from_db()
+
+    def test_factor_follows_elapsed_time(self):
+        self.decay(hours_ago=20)
+        self.assertAlmostEqual(self.hot.popularity, 2.0, places=2)
+        self.decay(hours_ago=10)
+        self.assertAlmostEqual(self.hot.popularity, 1.0, places=2)
+
+    def test_repeated_run_is_deferred(self):
+        self.decay(hours_ago=10)
+        self.decay()
+        self.assertAlmostEqual(self.hot.popularity, 4.0, places=2)
+
+    def test_near_zero_scores_are_zeroed(self):
+        self.decay(hours_ago=10)
+        self.assertEqual(self.cold.popularity, 0)
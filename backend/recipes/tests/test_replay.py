@@ -0,0 +1,29 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+LOG = (
+    '10.0.0.1 - - [19/Oct/2026:10:00:00 +0000] '
+    '"GET /api/tags/ HTTP/1.1" 200 2 "-" "curl"\n'
+    '10.0.0.1 - - [19/Oct/2026:10:00:01 +0000] '
+    '"GET /api/tags/999999/ HTTP/1.1" 404 2 "-" "curl"\n'
+)
+
+
+class ReplayAccessLogTests(TestCase):
+
+    def test_client_errors_are_reported_separately(self):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.log', delete=False
+        ) as log:
+            log.write(LOG)
+        self.addCleanup(os.unlink, log.name)
+        out = StringIO()
+        call_command(
+            'replay_access_log', log.name, anonymous=True, speedup=0,
+            workers=1, stdout=out
+        )
+        self.assertIn('ответов 4xx: 1, 5xx: 0', out.getvalue())
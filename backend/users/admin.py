@@ -10,7 +10,7 @@ class UserAdmin(admin.ModelAdmin):
         'first_name',
         'last_name'
     )
-    search_fields = ('username', 'email')
+    search_fields = ('^username', '^email')
     list_filter = ('first_name', 'last_name')
     ordering = ('username', )
     empty_value_display = '-пусто-'
@@ -22,9 +22,11 @@ class FollowerAdmin(admin.ModelAdmin):
         'user',
         'author'
     )
-    list_editable = ('user', 'author')
-    ordering = ("user",)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('user__username', 'author__username')
     empty_value_display = '-пусто-'
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-19 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_follow_suggestions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventTicket',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='Ключ')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Билет потока событий',
+                'verbose_name_plural': 'Билеты потока событий',
+            },
+        ),
+    ]
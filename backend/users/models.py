@@ -62,8 +62,84 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+        indexes = [
+            models.Index(
+                fields=('user', '-id'),
+                name='follow_user_id_idx'
+            ),
+            models.Index(
+                fields=('author', 'user'),
+                name='follow_author_user_idx'
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
 
     def __str__(self):
         return f"{self.user} подписан на {self.author}"
+
+
+class FollowSuggestion(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='follow_suggestions'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Рекомендуемый автор',
+        related_name='+'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        ordering = ('-score',)
+        verbose_name = 'Рекомендация подписки'
+        verbose_name_plural = 'Рекомендации подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow_suggestion'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-score'),
+                name='follow_suggestion_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.author} ({self.score:.2f})"
+
+
+class EventTicket(models.Model):
+    """Одноразовый билет на подключение к потоку событий.
+
+    EventSource не умеет задавать заголовки, а токен в адресе попадал бы
+    в журналы доступа; короткоживущий билет гасится при первом входе.
+    """
+    key = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name='Ключ'
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Пользователь'
+    )
+    expires_at = models.DateTimeField(
+        verbose_name='Действует до',
+        db_index=True
+    )
+
+    class Meta:
+        verbose_name = 'Билет потока событий'
+        verbose_name_plural = 'Билеты потока событий'
+
+    def __str__(self):
+        return f'{self.user}: {self.expires_at}'